@@ -0,0 +1,3 @@
+"""
+Benchmarks for feature.py on generated KDD Cup 2013 shaped data
+"""
@@ -0,0 +1,52 @@
+import os, sys, time, shutil, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import compression
+from bench import generate
+
+
+def copyFile(source, dest, blockSize=1 << 20):
+  """
+  Copy source to dest through compression.openFile, return seconds
+  """
+  start = time.time()
+  with compression.openFile(source) as f:
+    with compression.openFile(dest, 'wb') as out:
+      while True:
+        block = f.read(blockSize)
+        if len(block) == 0:
+          break
+        out.write(block)
+  return time.time() - start
+
+
+def main():
+  """
+  python -m bench.compressed [scale]
+  Size, write and read seconds of generated PaperAuthor.csv in each codec
+  """
+  runDir = tempfile.mkdtemp()
+
+  try:
+    generate.writeDataset(runDir, float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
+    path = os.path.join(runDir, 'PaperAuthor.csv')
+    size = os.path.getsize(path)
+
+    print '[*] PaperAuthor.csv, %0.1f MB, %d threads' % (size / 2.0 ** 20, compression.THREADS)
+    for ext in compression.codecs:
+      try:
+        write = copyFile(path, path + ext)
+        read = copyFile(path + ext, path + '.copy')
+      except IOError as e:
+        print ' # %-4s : %s' % (ext[1:], e)
+        continue
+
+      compressed = os.path.getsize(path + ext)
+      print ' # %-4s : x%4.1f, write %0.3f s (%6.1f MB/s), read %0.3f s (%6.1f MB/s)' % \
+            (ext[1:], size / float(compressed), write, size / max(write, 1e-9) / 2 ** 20,
+             read, size / max(read, 1e-9) / 2 ** 20)
+  finally:
+    shutil.rmtree(runDir)
+
+if __name__ == "__main__":
+  main()
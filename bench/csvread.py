@@ -0,0 +1,55 @@
+import csv, os, sys, time, shutil, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import csvio
+from bench import generate
+
+
+def legacyRead(path, columns):
+  """
+  csv.reader with int() per cell and split() per id list, as the readers used to do
+  """
+  with open(path, 'rb') as csvFile:
+    reader = csv.reader(csvFile)
+    reader.next()
+
+    for row in reader:
+      [int(row[index]) if kind == csvio.INT else \
+       map(int, row[index].split()) if kind == csvio.IDS else row[index] for index, kind in columns]
+
+
+def readAll(path, columns, reader):
+  for chunk in csvio.readColumns(path, columns, reader=reader):
+    pass
+
+
+def main():
+  """
+  python -m bench.csvread [scale]
+  PaperAuthor.csv and Train.csv of a generated dataset, each csvio reader vs. csv.reader
+  """
+  runDir = tempfile.mkdtemp()
+
+  try:
+    generate.writeDataset(runDir, float(sys.argv[1]) if len(sys.argv) > 1 else 1.0)
+    files = [('PaperAuthor.csv', [(0, csvio.INT), (1, csvio.INT), (3, csvio.STR)]),
+             ('Train.csv', [(0, csvio.INT), (1, csvio.IDS), (2, csvio.IDS)])]
+
+    for name, columns in files:
+      path = os.path.join(runDir, name)
+      start = time.time()
+      legacyRead(path, columns)
+      legacy = time.time() - start
+
+      print '[*] %s, %d MB' % (name, os.path.getsize(path) >> 20)
+      print ' # %-8s : %0.3f s' % ('legacy', legacy)
+      for reader in sorted(csvio.readers):
+        start = time.time()
+        readAll(path, columns, reader)
+        seconds = time.time() - start
+        print ' # %-8s : %0.3f s (x%0.1f)' % (reader, seconds, legacy / max(seconds, 1e-9))
+  finally:
+    shutil.rmtree(runDir)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,211 @@
+import csv, os, random
+import argparse, bisect, collections
+
+
+def writePaperAuthor(path, numPapers=20000, numAuthors=5000, maxAuthors=8, seed=13):
+  """
+  Write PaperAuthor.csv with a skewed number of papers per author
+  """
+  rand = random.Random(seed)
+
+  with open(path, 'wb') as csvOut:
+    writer = csv.writer(csvOut, delimiter=',')
+    writer.writerow(['PaperId','AuthorId','Name','Affiliation'])
+
+    for pid in range(1, numPapers + 1):
+      for i in range(rand.randint(1, maxAuthors)):
+        aid = int(rand.paretovariate(1.2)) % numAuthors + 1
+        writer.writerow([pid, aid, 'author %d' % aid, 'university %d' % (aid % 97)])
+
+
+def paperPublish(numPapers=20000, numVenues=500, seed=13):
+  """
+  Return paperId -> conferenceId/journalId
+  """
+  rand = random.Random(seed)
+  return dict((pid, rand.randint(1, numVenues)) for pid in range(1, numPapers + 1))
+
+
+def writePaper(path, numPapers=20000, numVenues=500, seed=13):
+  """
+  Write Paper.csv with titles of mixed case, punctuation, digits, non-ASCII and stopwords
+  """
+  rand = random.Random(seed)
+  words = ['learning', 'Graph', 'NETWORKS', 'of', 'the', 'a', 'for', 'data-mining', 'Bayesian',
+           'model(s)', 'on', 'analysis:', '3D', 'r\xc3\xa9seaux', 'with', 'Large-Scale', 'in', 'k-means']
+
+  with open(path, 'wb') as csvOut:
+    writer = csv.writer(csvOut, delimiter=',')
+    writer.writerow(['Id','Title','Year','ConferenceId','JournalId','Keyword'])
+
+    for pid in range(1, numPapers + 1):
+      title = ' '.join(rand.choice(words) for i in range(rand.randint(0, 12)))
+      venue = rand.randint(1, numVenues)
+      writer.writerow([pid, title, rand.randint(1880, 2020), venue if venue % 2 else 0, 0 if venue % 2 else venue, ''])
+
+
+class Zipf:
+  """
+  Seeded sampler of 1 .. n with P(k) ~ 1 / k ** s
+  """
+  def __init__(self, rand, n, s=1.1):
+    self.rand = rand
+    self.cumulative = []
+    total = 0.0
+    for k in range(1, n + 1):
+      total += 1.0 / k ** s
+      self.cumulative.append(total)
+
+
+  def sample(self):
+    return bisect.bisect_left(self.cumulative, self.rand.random() * self.cumulative[-1]) + 1
+
+
+stopwords = ['of', 'the', 'a', 'for', 'on', 'in', 'with', 'and', 'to', 'by']
+topics = ['learning', 'graph', 'network', 'data', 'mining', 'bayesian', 'model', 'analysis', 'query',
+          'system', 'neural', 'optimization', 'distributed', 'database', 'search', 'clustering',
+          'semantic', 'web', 'image', 'retrieval', 'parallel', 'inference', 'kernel', 'protein',
+          'wireless', 'sensor', 'scheduling', 'compiler', 'logic', 'vision', 'speech', 'robot']
+
+
+def randomTitle(rand, words, length):
+  """
+  Return words drawn by a Zipf sampler, stopwords and mixed case between them
+  """
+  text = []
+  for i in range(0, length):
+    word = topics[(words.sample() - 1) % len(topics)]
+    if rand.random() < 0.2:
+      word = word.capitalize()
+    text.append(word)
+    if i + 1 < length and rand.random() < 0.3:
+      text.append(rand.choice(stopwords))
+  return ' '.join(text)
+
+
+def writeDataset(directory, scale=1.0, seed=13):
+  """
+  Write Author, Conference, Journal, Paper, PaperAuthor, Train, Valid,
+  ValidSolution and Test csv files with the columns of KDD Cup 2013 track 1.
+  Papers per author, authors per paper, venue popularity, affiliations and
+  title words are Zipfian. Return dict of # rows of each file
+  """
+  rand = random.Random(seed)
+  numPapers      = max(100, int(20000 * scale))
+  numAuthors     = max(40, int(8000 * scale))
+  numConferences = max(10, int(200 * scale))
+  numJournals    = max(10, int(400 * scale))
+  numInstitutes  = max(10, int(300 * scale))
+  numLabeled     = max(6, int(300 * scale))  # authors of each of Train, Valid, Test
+  counts = {}
+
+  if not os.path.exists(directory):
+    os.makedirs(directory)
+
+  def writer(name, header):
+    csvOut = open(os.path.join(directory, name), 'wb')
+    out = csv.writer(csvOut, delimiter=',')
+    out.writerow(header)
+    return csvOut, out
+
+  words = Zipf(rand, len(topics) * 4)
+  institutes = Zipf(rand, numInstitutes)
+
+  for name, prefix, size in (('Conference.csv', 'International Conference on', numConferences),
+                             ('Journal.csv', 'Journal of', numJournals)):
+    csvOut, out = writer(name, ['Id','ShortName','FullName','HomePage'])
+    for vid in range(1, size + 1):
+      full = '' if rand.random() < 0.05 else '%s %s' % (prefix, randomTitle(rand, words, rand.randint(1, 4)))
+      out.writerow([vid, 'V%d' % vid, full, ''])
+    csvOut.close()
+    counts[name] = size
+
+  affiliation = {}
+  csvOut, out = writer('Author.csv', ['Id','Name','Affiliation'])
+  for aid in range(1, numAuthors + 1):
+    affiliation[aid] = '' if rand.random() < 0.4 else \
+                       'University of %s %d' % (rand.choice(topics).capitalize(), institutes.sample())
+    out.writerow([aid, 'Author %d' % aid, affiliation[aid]])
+  csvOut.close()
+  counts['Author.csv'] = numAuthors
+
+  conferences = Zipf(rand, numConferences)
+  journals = Zipf(rand, numJournals)
+  csvOut, out = writer('Paper.csv', ['Id','Title','Year','ConferenceId','JournalId','Keyword'])
+  for pid in range(1, numPapers + 1):
+    r = rand.random()
+    cid = conferences.sample() if r < 0.45 else 0
+    jid = journals.sample() if 0.45 <= r < 0.9 else 0
+    r = rand.random()
+    year = 0 if r < 0.1 else rand.randint(1800, 2030) if r < 0.12 else int(2013 - rand.expovariate(0.1))
+    text = '' if rand.random() < 0.05 else randomTitle(rand, words, rand.randint(1, 10))
+    out.writerow([pid, text, year, cid, jid, ''])
+  csvOut.close()
+  counts['Paper.csv'] = numPapers
+
+  # Zipfian draws of authors give Zipfian papers per author
+  authors = Zipf(rand, numAuthors, 0.9)
+  publications = collections.defaultdict(list)
+  rows = 0
+  csvOut, out = writer('PaperAuthor.csv', ['PaperId','AuthorId','Name','Affiliation'])
+  for pid in range(1, numPapers + 1):
+    for i in range(0, min(20, int(rand.paretovariate(1.5)))):
+      aid = authors.sample()
+      publications[aid].append(pid)
+      out.writerow([pid, aid, 'Author %d' % aid, affiliation[aid] if rand.random() < 0.7 else ''])
+      rows += 1
+  csvOut.close()
+  counts['PaperAuthor.csv'] = rows
+
+  # Labeled authors are distinct, with at least 2 papers
+  labeled = [aid for aid in sorted(publications) if len(set(publications[aid])) >= 2]
+  rand.shuffle(labeled)
+  train = sorted(labeled[:numLabeled])
+  valid = sorted(labeled[numLabeled:2 * numLabeled])
+  test  = sorted(labeled[2 * numLabeled:3 * numLabeled])
+
+  def split(aid):
+    pids = sorted(set(publications[aid]))
+    rand.shuffle(pids)
+    cut = max(1, int(len(pids) * rand.uniform(0.5, 0.9)))
+    return ' '.join(map(str, pids[:cut])), ' '.join(map(str, pids[cut:]))
+
+  csvOut, out = writer('Train.csv', ['AuthorId','ConfirmedPaperIds','DeletedPaperIds'])
+  for aid in train:
+    out.writerow([aid] + list(split(aid)))
+  csvOut.close()
+
+  csvOut, out = writer('Valid.csv', ['AuthorId','PaperIds'])
+  solution, solutionOut = writer('ValidSolution.csv', ['AuthorId','PaperIds','Usage'])
+  for aid in valid:
+    confirmed, deleted = split(aid)
+    papers = (confirmed + ' ' + deleted).split()
+    rand.shuffle(papers)
+    out.writerow([aid, ' '.join(papers)])
+    solutionOut.writerow([aid, confirmed, 'Public' if rand.random() < 0.5 else 'Private'])
+  solution.close()
+  csvOut.close()
+
+  csvOut, out = writer('Test.csv', ['AuthorId','PaperIds'])
+  for aid in test:
+    out.writerow([aid, ' '.join(map(str, sorted(set(publications[aid]))))])
+  csvOut.close()
+
+  for name, size in (('Train.csv', len(train)), ('Valid.csv', len(valid)),
+                     ('ValidSolution.csv', len(valid)), ('Test.csv', len(test))):
+    counts[name] = size
+  return counts
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Write KDD Cup 2013 shaped csv files')
+  parser.add_argument('directory', nargs='?', default='original_data')
+  parser.add_argument('--scale', type=float, default=1.0, help='1.0 = 20000 papers, 8000 authors')
+  parser.add_argument('--seed', type=int, default=13)
+  args = parser.parse_args()
+
+  for name, rows in sorted(writeDataset(args.directory, args.scale, args.seed).iteritems()):
+    print ' # %-18s %9d rows' % (name, rows)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,80 @@
+import csv, os, sys, time, shutil, tempfile
+import operator, collections
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import feature
+from idmap import IdArray
+from bench import generate
+
+
+def legacyReadPaperAuthor(data, csvFile):
+  """
+  Per-row recount and renormalization, as readPaperAuthor used to do
+  """
+  paperCoAuthors     = collections.defaultdict(dict)
+  authorPublications = collections.defaultdict(dict)
+  authorPublishCount = collections.defaultdict(feature.ddInt)
+
+  with open(csvFile, 'rb') as f:
+    reader = csv.reader(f)
+    reader.next()
+
+    for row in reader:
+      pid = int(row[0])
+      aid = int(row[1])
+
+      paperCoAuthors[pid][aid] = 1
+      authorPublications[aid][pid] = 1
+
+      for pid in authorPublications[aid]:
+        if pid in data.paperPublish:
+          cid = data.paperPublish[pid]
+          authorPublishCount[aid][cid] += 1
+
+      if len(authorPublishCount[aid]) > 0:
+        maxCount = max(authorPublishCount[aid].iteritems(), key=operator.itemgetter(1))[1]
+        minCount = min(authorPublishCount[aid].iteritems(), key=operator.itemgetter(1))[1]
+        if maxCount == minCount:
+          for cid in authorPublishCount[aid]:
+            authorPublishCount[aid][cid] = 1
+        else:
+          for cid in authorPublishCount[aid]:
+            authorPublishCount[aid][cid] -= minCount
+            authorPublishCount[aid][cid] /= float(maxCount - minCount)
+
+
+def timeIt(function, *arg):
+  start = time.time()
+  function(*arg)
+  return time.time() - start
+
+
+def main():
+  numPapers = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+  runDir = tempfile.mkdtemp()
+
+  try:
+    csvFile = runDir + '/original_data/PaperAuthor.csv'
+    data = feature.Data(runDir)
+    generate.writePaperAuthor(csvFile, numPapers=numPapers, numAuthors=numPapers / 4)
+    publish = generate.paperPublish(numPapers=numPapers)
+
+    data.paperPublish = publish
+    legacy = timeIt(legacyReadPaperAuthor, data, csvFile)
+
+    data = feature.Data(runDir)
+    data.done.update(['author', 'paper'])  # only PaperAuthor.csv is generated
+    data.authorAffiliation = {}
+    data.paperPublish = IdArray.fromItems(publish.iteritems(), np.int64, -1)
+    twoPhase = timeIt(data.readPaperAuthor)
+
+    print '[*] PaperAuthor.csv with %d papers' % numPapers
+    print ' # legacy    : %0.3f s' % legacy
+    print ' # two-phase : %0.3f s (x%0.1f)' % (twoPhase, legacy / max(twoPhase, 1e-9))
+  finally:
+    shutil.rmtree(runDir)
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,155 @@
+import json, os, sys, time, shutil, tempfile
+import argparse, collections, random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import feature, metrics
+from bench import generate
+
+
+def runStages(runDir):
+  """
+  Run every stage of feature.stageGraph on a cold cache, return Data
+  """
+  data = feature.Data(runDir)
+  for name in feature.stageGraph:
+    data.require(name)
+  return data
+
+
+def runTestFull(runDir):
+  """
+  Return seconds of readTestFull and the stages it needs, on a cold cache
+  """
+  data = feature.Data(runDir)
+  start = time.time()
+  data.require('testfull')
+  return time.time() - start
+
+
+def timeKernel(function, inputs, repeat=3):
+  """
+  Return best seconds of repeat runs of function over inputs
+  """
+  best = None
+  for i in range(0, repeat):
+    start = time.time()
+    for arg in inputs:
+      function(*arg)
+    seconds = time.time() - start
+    best = seconds if best is None else min(best, seconds)
+  return best
+
+
+def kernelInputs(data, count, seed):
+  """
+  Return {kernel: (function, [arguments])} drawn from the tables of data
+  """
+  rand = random.Random(seed)
+  titles = [title for pid, title in data.paperTitle.iteritems() if len(title) > 0]
+  authors = sorted(aid for aid in data.confirmed if len(data.graph.publications(aid)) > 0)
+
+  pairs = [(rand.choice(titles), rand.choice(titles)) for i in range(0, count)]
+
+  publications = []
+  coauthors = []
+  batches = []
+  for i in range(0, count):
+    aid = rand.choice(authors)
+    pid = rand.choice(data.graph.publications(aid))
+    publications.append((data.getPaperInfo(pid), data.getPublicationsInfo(aid)[:50]))
+    coauthors.append((data.getAuthorInfo(aid), data.getCoAuthorsInfo(aid, pid)))
+    batches.append((aid, data.graph.publications(aid)[:50]))
+
+  data.graph.venues()
+  return collections.OrderedDict([('stringDistance', (feature.stringDistance, pairs)),
+                                  ('publicationCmp', (feature.publicationCmp, publications)),
+                                  ('coauthorCmp', (feature.coauthorCmp, coauthors)),
+                                  ('coauthorSimilarities', (data.coauthorSimilarities, batches))])
+
+
+def compare(results, baseline, tolerance, minSeconds=0.05):
+  """
+  Print seconds and peak RSS against baseline. Return # entries slower than
+  1 + tolerance times and minSeconds, shorter stages are mostly noise
+  """
+  slower = 0
+  for section in ('stages', 'kernels'):
+    for name, entry in results[section].iteritems():
+      base = baseline.get(section, {}).get(name)
+      if base is None:
+        print ' # %-22s new' % name
+        continue
+
+      ratio = entry['seconds'] / max(base['seconds'], 1e-9)
+      memory = ''
+      if 'peakRSS' in entry and 'peakRSS' in base:
+        memory = ' %5d MB vs. %5d MB' % (entry['peakRSS'] >> 20, base['peakRSS'] >> 20)
+      flag = ''
+      if ratio > 1 + tolerance and entry['seconds'] - base['seconds'] > minSeconds:
+        flag = ' SLOWER'
+        slower += 1
+      print ' # %-22s %9.3f s vs. %9.3f s (x%0.2f)%s%s' % \
+            (name, entry['seconds'], base['seconds'], ratio, memory, flag)
+  return slower
+
+
+def main():
+  """
+  python -m bench.stages [--scale 1.0] [--baseline bench_baseline.json] [--save-baseline]
+  """
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--scale', type=float, default=1.0, help='generated data scale, see bench.generate')
+  parser.add_argument('--seed', type=int, default=13)
+  parser.add_argument('--calls', type=int, default=2000, help='calls of each micro-kernel')
+  parser.add_argument('--baseline', default='bench_baseline.json')
+  parser.add_argument('--save-baseline', action='store_true', help='store results as the baseline')
+  parser.add_argument('--tolerance', type=float, default=0.25, help='slowdown flagged as a regression')
+  args = parser.parse_args()
+
+  runDir = tempfile.mkdtemp()
+  try:
+    counts = generate.writeDataset(runDir + '/original_data', args.scale, args.seed)
+
+    # Peak RSS is that of the process at the end of each stage
+    data = runStages(runDir)
+    stages = collections.OrderedDict()
+    for name, record in metrics.default.stages.iteritems():
+      stages[name] = dict((k, record[k]) for k in ('seconds', 'rows', 'peakRSS'))
+    counters = data.counters()
+
+    kernels = collections.OrderedDict()
+    for name, (function, inputs) in kernelInputs(data, args.calls, args.seed).iteritems():
+      seconds = timeKernel(function, inputs)
+      kernels[name] = {'calls': len(inputs), 'seconds': seconds}
+
+    shutil.rmtree(runDir + '/pickles')
+    shutil.rmtree(runDir + '/preprocess')
+    stages['testfull end to end'] = {'seconds': runTestFull(runDir), 'rows': counts['Test.csv']}
+  finally:
+    shutil.rmtree(runDir)
+
+  results = collections.OrderedDict([('scale', args.scale), ('seed', args.seed), ('rows', counts),
+                                     ('stages', stages), ('kernels', kernels), ('counters', counters)])
+
+  print '[*] Stages, scale %g' % args.scale
+  for name, entry in stages.iteritems():
+    print ' # %-22s %9.3f s %10d rows' % (name, entry['seconds'], entry['rows'])
+  print '[*] Kernels'
+  for name, entry in kernels.iteritems():
+    print ' # %-22s %9.3f s %10d calls/s' % (name, entry['seconds'], entry['calls'] / max(entry['seconds'], 1e-9))
+
+  if args.save_baseline:
+    with open(args.baseline, 'wb') as f:
+      json.dump(results, f, indent=2)
+    print '[*] Baseline saved to %s' % args.baseline
+  elif os.path.isfile(args.baseline):
+    with open(args.baseline, 'rb') as f:
+      baseline = json.load(f)
+    if (baseline.get('scale'), baseline.get('seed')) != (args.scale, args.seed):
+      print '[!] Baseline is of scale %s, seed %s' % (baseline.get('scale'), baseline.get('seed'))
+    print '[*] Against %s' % args.baseline
+    if compare(results, baseline, args.tolerance) > 0:
+      sys.exit(1)
+
+if __name__ == "__main__":
+  main()
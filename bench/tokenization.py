@@ -0,0 +1,61 @@
+import csv, os, sys, time, shutil, tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from nltk.corpus import stopwords
+
+import feature
+from tokenizer import Tokenizer
+from bench import generate
+
+
+def readTitles(path):
+  with open(path, 'rb') as csvFile:
+    reader = csv.reader(csvFile)
+    reader.next()
+    return [row[1] for row in reader if len(row[1]) > 0]
+
+
+def main():
+  """
+  python -m bench.tokenization [# papers]
+  Titles of original_data/Paper.csv if present, else of a generated Paper.csv
+  """
+  runDir = tempfile.mkdtemp()
+
+  try:
+    if os.path.isfile('original_data/Paper.csv'):
+      path = 'original_data/Paper.csv'
+    else:
+      path = runDir + '/Paper.csv'
+      generate.writePaper(path, numPapers=int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
+    titles = readTitles(path)
+    stopword = stopwords.words('english')
+
+    start = time.time()
+    legacy = [feature.stripWords(title, stopword) for title in titles]
+    legacyTime = time.time() - start
+
+    tokenizer = Tokenizer(stopword)
+    start = time.time()
+    normalized = tokenizer.normalizeMany(titles)
+    tokenizerTime = time.time() - start
+
+    start = time.time()
+    for string in normalized:
+      tokenizer.tokenIds(string)
+    tokenTime = time.time() - start
+
+    if normalized != legacy:
+      print '[!] Tokenizer differs from stripWords on %d titles' % \
+            sum(1 for a, b in zip(normalized, legacy) if a != b)
+
+    print '[*] %d titles of %s' % (len(titles), path)
+    print ' # stripWords : %0.3f s, %d titles/s' % (legacyTime, len(titles) / max(legacyTime, 1e-9))
+    print ' # Tokenizer  : %0.3f s, %d titles/s (x%0.1f)' % \
+          (tokenizerTime, len(titles) / max(tokenizerTime, 1e-9), legacyTime / max(tokenizerTime, 1e-9))
+    print ' # token ids  : %0.3f s, %d words' % (tokenTime, len(tokenizer.words))
+  finally:
+    shutil.rmtree(runDir)
+
+if __name__ == "__main__":
+  main()
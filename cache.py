@@ -0,0 +1,127 @@
+import os, re, glob, hashlib
+import pickle, shutil, tempfile
+
+import compression
+
+KEY_SIZE = 16  # hex digits of an artifact key
+
+
+class CacheManager:
+  """
+  Versioned artifacts in cacheDir. An artifact file name carries the digest of
+    code version, source files (size, mtime, head), parameters and the keys of
+    upstream artifacts
+  so a changed input or upstream artifact never loads a stale artifact
+  """
+  def __init__(self, cacheDir, version):
+    self.cacheDir = cacheDir
+    self.version = version
+    self.keys = {}  # name -> key of artifact last loaded or saved
+    self.hits = 0    # artifacts found, each counted once per key
+    self.misses = 0
+
+    if not os.path.exists(cacheDir):
+      os.makedirs(cacheDir)
+
+
+  def key(self, name, sources=(), params=None, deps=()):
+    """
+    Return digest identifying artifact name
+    """
+    h = hashlib.sha1()
+    h.update(repr((name, self.version)))
+
+    for source in sources:
+      source = compression.find(source)
+      stat = os.stat(source)
+      h.update(repr((os.path.basename(source), stat.st_size, stat.st_mtime)))
+      with open(source, 'rb') as f:
+        h.update(f.read(65536))
+
+    for k in sorted(params or {}):
+      h.update(repr((k, params[k])))
+
+    for dep in deps:
+      h.update(repr((dep, self.keys.get(dep))))
+
+    return h.hexdigest()[:KEY_SIZE]
+
+
+  def path(self, name, key):
+    base, ext = os.path.splitext(name)
+    return os.path.join(self.cacheDir, '%s.%s%s' % (base, key, ext))
+
+
+  def load(self, name, key):
+    """
+    Return list of pickled values of artifact, None if missing
+    """
+    path = self.path(name, key)
+    if not self.found(name, key, os.path.isfile(path)):
+      return None
+
+    with open(path, 'rb') as f:
+      values = pickle.load(f)
+    return values
+
+
+  def save(self, name, key, *values):
+    """
+    Pickle values to a temporary file and rename it over the artifact
+    """
+    fd, tmp = tempfile.mkstemp(dir=self.cacheDir, prefix='.' + name)
+    with os.fdopen(fd, 'wb') as f:
+      pickle.dump(list(values), f, pickle.HIGHEST_PROTOCOL)
+
+    os.rename(tmp, self.path(name, key))
+    self.expire(name, key)
+    self.keys[name] = key
+
+
+  def has(self, name, key):
+    return self.found(name, key, os.path.isfile(self.path(name, key)))
+
+
+  def hasDir(self, name, key):
+    return self.found(name, key, os.path.isdir(self.path(name, key)))
+
+
+  def found(self, name, key, exists):
+    """
+    Count a lookup of artifact name, set its key if it exists. Return exists
+    """
+    if not exists:
+      self.misses += 1
+    elif self.keys.get(name) != key:
+      self.hits += 1
+      self.keys[name] = key
+    return exists
+
+
+  def tempDir(self, name):
+    return tempfile.mkdtemp(dir=self.cacheDir, prefix='.' + name)
+
+
+  def commitDir(self, tmpDir, name, key):
+    """
+    Rename a directory written by tempDir() into the artifact
+    """
+    os.rename(tmpDir, self.path(name, key))
+    self.expire(name, key)
+    self.keys[name] = key
+
+
+  def expire(self, name, key):
+    """
+    Remove other versions of artifact, named <base>.<key><ext>. Other files
+    in cacheDir, like the author.db.dat shelve of a SpillDict, are kept
+    """
+    base, ext = os.path.splitext(name)
+    version = re.compile('%s\\.[0-9a-f]{%d}%s$' % (re.escape(base), KEY_SIZE, re.escape(ext)))
+    for path in glob.glob(os.path.join(self.cacheDir, '%s.*%s' % (base, ext))):
+      if path == self.path(name, key) or not version.match(os.path.basename(path)):
+        continue
+      if ext == '' and os.path.isdir(path):
+        shutil.rmtree(path)
+      elif ext != '' and os.path.isfile(path):
+        os.remove(path)
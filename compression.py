@@ -0,0 +1,270 @@
+import bz2, io, os, signal, subprocess, time, zlib
+import collections, multiprocessing
+from distutils.spawn import find_executable
+from multiprocessing.pool import ThreadPool
+
+try:
+  import lzma
+except ImportError:
+  try:
+    from backports import lzma
+  except ImportError:
+    lzma = None
+
+import metrics
+
+BUFFER_SIZE = 1 << 20  # bytes per read of compressed input and per compressed output block
+THREADS = multiprocessing.cpu_count()
+
+
+def gzipCompressor():
+  return zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+
+def gzipDecompressor():
+  return zlib.decompressobj(16 + zlib.MAX_WBITS)
+
+
+class Codec:
+  """
+  Compression of a file extension
+    compressor(), decompressor() : incremental objects in this process, None if
+      the module is missing. Streams of concatenated files are read one after another
+    readTools  : [argv] decompressing stdin to stdout, in order of preference
+    writeTools : [argv] compressing stdin to stdout with '%(threads)d' threads
+  """
+  def __init__(self, name, compressor, decompressor, readTools, writeTools):
+    self.name = name
+    self.compressor = compressor
+    self.decompressor = decompressor
+    self.readTools = readTools
+    self.writeTools = writeTools
+
+
+  def tool(self, tools, threads=1):
+    """
+    Return argv of the first tool on PATH, None if none is
+    """
+    for argv in tools:
+      if find_executable(argv[0]) is not None:
+        return [arg % {'threads': threads} for arg in argv]
+    return None
+
+
+codecs = collections.OrderedDict([
+  ('.gz', Codec('gz', gzipCompressor, gzipDecompressor,
+                [['pigz', '-dc'], ['gzip', '-dc']],
+                [['pigz', '-c', '-p', '%(threads)d']])),
+  ('.bz2', Codec('bz2', bz2.BZ2Compressor, bz2.BZ2Decompressor,
+                 [['lbzip2', '-dc'], ['pbzip2', '-dc'], ['bzip2', '-dc']],
+                 [['lbzip2', '-c', '-n', '%(threads)d'], ['pbzip2', '-c', '-p%(threads)d']])),
+  ('.xz', Codec('xz', lzma and lzma.LZMACompressor, lzma and lzma.LZMADecompressor,
+                [['xz', '-dc']],
+                [['xz', '-c', '-T', '%(threads)d']]))])
+
+
+def codecOf(path):
+  """
+  Return Codec of path by extension, None for an uncompressed file
+  """
+  return codecs.get(os.path.splitext(path)[1].lower())
+
+
+def find(path):
+  """
+  Return path if it exists, else the first existing path + .gz / .bz2 / .xz, else path
+  """
+  if os.path.exists(path):
+    return path
+  for ext in codecs:
+    if os.path.exists(path + ext):
+      return path + ext
+  return path
+
+
+def defaultSigpipe():
+  # Python ignores SIGPIPE, a tool closed early by its reader should just exit
+  signal.signal(signal.SIGPIPE, signal.SIG_DFL)
+
+
+def compressBlock(codec, data):
+  """
+  Return data as one complete compressed stream, blocks are concatenated
+  """
+  compressor = codec.compressor()
+  return compressor.compress(data) + compressor.flush()
+
+
+class CodecStream(io.RawIOBase):
+  """
+  Uncompressed bytes of a compressed file, read or written (mode 'rb', 'wb', 'ab') by
+    a tool process, when one is on PATH and there is more than one cpu or no module
+    blocks compressed by a thread pool, writing with threads > 1
+    the incremental (de)compressor, otherwise
+  Bytes and seconds spent in the codec are counted by the stage opening the file
+  """
+  def __init__(self, codec, path, mode, threads=THREADS, bufferSize=BUFFER_SIZE):
+    io.RawIOBase.__init__(self)
+    self.codec = codec
+    self.path = path
+    self.writing = 'r' not in mode
+    self.bufferSize = bufferSize
+    self.stage = metrics.default.current()
+    self.rawBytes = 0
+    self.bytes = 0  # compressed bytes read
+    self.seconds = 0.0
+
+    self.file = open(path, 'ab' if 'a' in mode else 'wb' if self.writing else 'rb')
+    self.start = self.file.tell()
+    self.process = None
+    self.pool = None
+
+    inProcess = (codec.compressor if self.writing else codec.decompressor) is not None
+    tool = codec.tool(codec.writeTools if self.writing else codec.readTools, threads)
+    if tool is None and not inProcess and self.writing:
+      tool = codec.tool(codec.writeTools, 1)
+    if tool is not None and (threads > 1 or not inProcess):
+      self.method = os.path.basename(tool[0])
+      if self.writing:
+        self.process = subprocess.Popen(tool, stdin=subprocess.PIPE, stdout=self.file, bufsize=bufferSize,
+                                        preexec_fn=defaultSigpipe)
+      else:
+        self.process = subprocess.Popen(tool, stdin=self.file, stdout=subprocess.PIPE, bufsize=bufferSize,
+                                        preexec_fn=defaultSigpipe)
+    elif not inProcess:
+      self.file.close()
+      raise IOError('no %s codec for %s: install its python module or command line tool' % (codec.name, path))
+    elif self.writing and threads > 1:
+      self.method = '%d threads' % threads
+      self.pool = ThreadPool(threads)
+      self.pending = collections.deque()  # AsyncResults of blocks in order
+      self.block = []
+      self.blockBytes = 0
+      self.window = threads * 2
+    else:
+      self.method = 'python'
+      self.coder = codec.compressor() if self.writing else codec.decompressor()
+      self.decoded = ''
+      self.offset = 0  # of self.decoded returned by readinto
+      self.eof = False
+
+
+  def readable(self):
+    return not self.writing
+
+
+  def writable(self):
+    return self.writing
+
+
+  def decompress(self, data):
+    out = []
+    while len(data) > 0:
+      try:
+        out.append(self.coder.decompress(data))
+      except EOFError:
+        # bz2 / xz: next stream of concatenated files
+        self.coder = self.codec.decompressor()
+        continue
+      data = self.coder.unused_data
+      if len(data) > 0:
+        self.coder = self.codec.decompressor()
+    return ''.join(out)
+
+
+  def readinto(self, b):
+    start = time.time()
+    if self.process is not None:
+      data = self.process.stdout.read(len(b))
+    else:
+      while self.offset >= len(self.decoded) and not self.eof:
+        compressed = self.file.read(self.bufferSize)
+        self.bytes += len(compressed)
+        self.eof = len(compressed) == 0
+        if self.eof and self.bytes == 0:
+          raise IOError('%s is empty, not a %s file' % (self.path, self.codec.name))
+        self.decoded, self.offset = self.decompress(compressed), 0
+      data = self.decoded[self.offset:self.offset + len(b)]
+      self.offset += len(data)
+
+    b[:len(data)] = data
+    self.rawBytes += len(data)
+    self.seconds += time.time() - start
+    return len(data)
+
+
+  def write(self, b):
+    start = time.time()
+    data = b.tobytes() if isinstance(b, memoryview) else str(b)
+    if self.process is not None:
+      self.process.stdin.write(data)
+    elif self.pool is not None:
+      self.block.append(data)
+      self.blockBytes += len(data)
+      if self.blockBytes >= self.bufferSize:
+        self.submit()
+    else:
+      self.file.write(self.coder.compress(data))
+
+    self.rawBytes += len(data)
+    self.seconds += time.time() - start
+    return len(data)
+
+
+  def submit(self):
+    self.pending.append(self.pool.apply_async(compressBlock, (self.codec, ''.join(self.block))))
+    self.block = []
+    self.blockBytes = 0
+    while len(self.pending) > self.window:
+      self.file.write(self.pending.popleft().get())
+
+
+  def close(self):
+    if self.closed:
+      return
+    start = time.time()
+    try:
+      # The BufferedWriter above wrote its buffer by write() before calling close()
+      io.RawIOBase.close(self)
+
+      if self.process is not None:
+        if self.writing:
+          self.process.stdin.close()
+        else:
+          self.process.stdout.close()
+        if self.process.wait() != 0 and (self.writing or self.process.returncode > 0):
+          raise IOError('%s of %s exited with %d' % (self.method, self.path, self.process.returncode))
+        if not self.writing:
+          # The tool read from the file descriptor shared with self.file
+          self.bytes = os.lseek(self.file.fileno(), 0, os.SEEK_CUR)
+      elif self.pool is not None:
+        if self.blockBytes > 0:
+          self.submit()
+        while len(self.pending) > 0:
+          self.file.write(self.pending.popleft().get())
+      elif self.writing:
+        self.file.write(self.coder.flush())
+    finally:
+      if self.pool is not None:
+        self.pool.terminate()
+      self.file.close()
+
+    self.seconds += time.time() - start
+    size = os.path.getsize(self.path) - self.start if self.writing else self.bytes
+    metrics.default.addIO(self.stage, '%s %s (%s)' % (self.codec.name, 'write' if self.writing else 'read',
+                          self.method), size, self.rawBytes, self.seconds)
+
+
+def openFile(path, mode='rb', bufferSize=BUFFER_SIZE, threads=THREADS):
+  """
+  Open path for buffered reading or writing, (de)compressed by its extension.
+  A missing path is read from path.gz / .bz2 / .xz if one exists
+  """
+  if 'r' in mode:
+    path = find(path)
+  codec = codecOf(path)
+  if codec is None:
+    return open(path, mode, bufferSize)
+
+  stream = CodecStream(codec, path, mode, threads, bufferSize)
+  return io.BufferedReader(stream, bufferSize) if 'r' in mode else io.BufferedWriter(stream, bufferSize)
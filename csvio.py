@@ -0,0 +1,258 @@
+import csv, operator
+
+import numpy as np
+
+import compression
+
+try:
+  import pandas
+except ImportError:
+  pandas = None
+
+INT = 'int'  # int64 array
+STR = 'str'  # list of str
+IDS = 'ids'  # IdLists of a space separated id column
+
+# Characters numpy may read as integers and their separators
+_integerChars = np.zeros(256, dtype=bool)
+_integerChars[[ord(c) for c in '0123456789+- \t\r\n']] = True
+
+
+class IdLists:
+  """
+  Space separated id lists of a column as one flat int64 array:
+  ids[offsets[i]:offsets[i + 1]] are the ids of row i
+  """
+  def __init__(self, ids, offsets):
+    self.ids = ids
+    self.offsets = offsets
+
+
+  def __len__(self):
+    return len(self.offsets) - 1
+
+
+  def __getitem__(self, i):
+    return self.ids[self.offsets[i]:self.offsets[i + 1]]
+
+
+  def counts(self):
+    return np.diff(self.offsets)
+
+
+  def rows(self):
+    """
+    Return row of each id
+    """
+    return np.repeat(np.arange(len(self), dtype=np.int64), self.counts())
+
+
+  def select(self, mask):
+    """
+    Return IdLists of the ids where mask is True, rows kept even if emptied
+    """
+    counts = np.bincount(self.rows()[mask], minlength=len(self))
+    return IdLists(self.ids[mask], np.concatenate(([0], np.cumsum(counts))).astype(np.int64))
+
+
+  def unique(self):
+    """
+    Return IdLists with the ids of each row sorted and duplicates removed
+    """
+    rows = self.rows()
+    order = np.lexsort((self.ids, rows))
+    ids, rows = self.ids[order], rows[order]
+    keep = np.ones(len(ids), dtype=bool)
+    keep[1:] = (ids[1:] != ids[:-1]) | (rows[1:] != rows[:-1])
+    return IdLists(ids, self.offsets).select(keep) if len(ids) > 0 else self
+
+
+  def tolists(self):
+    """
+    Return list of int lists, one per row
+    """
+    ids = self.ids.tolist()
+    offsets = self.offsets.tolist()
+    return [ids[start:end] for start, end in zip(offsets[:-1], offsets[1:])]
+
+
+def parseIdLists(strings):
+  """
+  Return IdLists of space separated integer strings. All rows are parsed by
+  one numpy call, row boundaries come from the token starts
+  """
+  if len(strings) == 0:
+    return IdLists(np.zeros(0, dtype=np.int64), np.zeros(1, dtype=np.int64))
+
+  joined = '\n'.join(strings)
+  chars = np.frombuffer(joined, dtype=np.uint8)
+  if not _integerChars[chars].all():
+    raise ValueError('invalid integer in id lists')
+
+  token = chars > ord(' ')
+  starts = token.copy()
+  starts[1:] &= ~token[:-1]
+  if starts.any():
+    ids = np.fromstring(joined, dtype=np.int64, sep=' ')
+  else:
+    ids = np.zeros(0, dtype=np.int64)  # numpy reads a blank string as [0]
+  row = np.cumsum(chars == ord('\n'))  # row of each character
+  counts = np.bincount(row[starts], minlength=len(strings))
+  if counts.sum() != len(ids):
+    raise ValueError('invalid integer in id lists')
+  return IdLists(ids, np.concatenate(([0], np.cumsum(counts))).astype(np.int64))
+
+
+def parseInts(strings):
+  """
+  Return int64 array of integer strings, parsed by one numpy call. Cells
+  numpy does not read as one integer are converted by int() to raise its error
+  """
+  joined = ' '.join(strings)
+  ints = np.fromstring(joined, dtype=np.int64, sep=' ')
+  if len(ints) != len(strings) or not _integerChars[np.frombuffer(joined, dtype=np.uint8)].all():
+    ints = np.array(map(int, strings), dtype=np.int64)
+  return ints
+
+
+def readHeader(path):
+  """
+  Return column names of csv file path
+  """
+  with compression.openFile(path) as csvFile:
+    return csv.reader(csvFile).next()
+
+
+def readRows(path, chunkSize=50000):
+  """
+  Yield lists of csv rows, column names excluded
+  """
+  with compression.openFile(path) as csvFile:
+    reader = csv.reader(csvFile)
+    reader.next()  # pass column name
+
+    chunk = []
+    for row in reader:
+      chunk.append(row)
+      if len(chunk) >= chunkSize:
+        yield chunk
+        chunk = []
+
+    if len(chunk) > 0:
+      yield chunk
+
+
+def toColumns(rows, columns):
+  """
+  Return typed columns [(index, type)] of a list of csv rows. Short rows are
+  padded with empty strings
+  """
+  width = max(index for index, kind in columns) + 1
+  if min(map(len, rows)) < width:
+    rows = [row if len(row) >= width else row + [''] * (width - len(row)) for row in rows]
+
+  chunk = []
+  for index, kind in columns:
+    values = map(operator.itemgetter(index), rows)
+    if kind == INT:
+      chunk.append(parseInts(values))
+    elif kind == IDS:
+      chunk.append(parseIdLists(values))
+    else:
+      chunk.append(values)
+  return chunk
+
+
+def columnChunks(rows, columns, chunkSize=50000, skipShort=False):
+  """
+  Yield typed columns of chunks of an iterable of csv rows, blank rows skipped.
+  skipShort skips rows with fewer cells than columns need
+  """
+  width = max(index for index, kind in columns) + 1 if skipShort else 1
+  chunk = []
+  for row in rows:
+    if len(row) < width:
+      continue
+    chunk.append(row)
+    if len(chunk) >= chunkSize:
+      yield toColumns(chunk, columns)
+      chunk = []
+
+  if len(chunk) > 0:
+    yield toColumns(chunk, columns)
+
+
+class CsvReader:
+  """
+  Standard library csv.reader, cells converted by int() per row
+  """
+  def chunks(self, path, columns, chunkSize, skipShort=False):
+    with compression.openFile(path) as csvFile:
+      reader = csv.reader(csvFile)
+      reader.next()  # pass column name
+
+      for chunk in columnChunks(reader, columns, chunkSize, skipShort):
+        yield chunk
+
+
+class PandasReader:
+  """
+  pandas C parser, integer columns converted to int64 while parsing
+  """
+  def chunks(self, path, columns, chunkSize):
+    width = len(readHeader(path))
+    indices = sorted(set(index for index, kind in columns))
+    dtype = dict((index, np.int64 if kind == INT else object) for index, kind in columns)
+
+    # Same dialect as csv.reader: empty cells stay '', no NA values
+    with compression.openFile(path) as csvFile:
+      frames = pandas.read_csv(csvFile, header=None, skiprows=1, names=range(0, width), index_col=False,
+                               usecols=indices, dtype=dtype, na_filter=False, skip_blank_lines=True,
+                               chunksize=chunkSize, engine='c')
+      for frame in frames:
+        if len(frame) == 0:
+          continue
+        chunk = []
+        for index, kind in columns:
+          values = frame[index].values
+          if kind == INT:
+            chunk.append(values)
+          elif kind == IDS:
+            chunk.append(parseIdLists(values.tolist()))
+          else:
+            chunk.append(values.tolist())
+        yield chunk
+
+
+readers = {'csv': CsvReader}
+if pandas is not None:
+  readers['pandas'] = PandasReader
+
+default = 'pandas' if 'pandas' in readers else 'csv'
+
+
+def setDefault(name):
+  """
+  Select the reader of readColumns, one of readers
+  """
+  global default
+  if name not in readers:
+    raise ValueError('unknown csv reader %s, available: %s' % (name, ', '.join(sorted(readers))))
+  default = name
+
+
+def readColumns(path, columns, chunkSize=50000, reader=None, skipShort=False):
+  """
+  Yield chunks of csv file path as lists of typed columns, one per
+  (index, INT | STR | IDS) of columns, column names excluded.
+  Rows with fewer cells than columns need are padded with empty strings, or
+  skipped with skipShort. pandas pads them while parsing, so files read with
+  skipShort are parsed by csv.reader.
+  Compressed files are read by compression.openFile
+  """
+  if skipShort:
+    chunks = CsvReader().chunks(path, columns, chunkSize, skipShort)
+  else:
+    chunks = readers[reader or default]().chunks(path, columns, chunkSize)
+  for chunk in chunks:
+    yield chunk
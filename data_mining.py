@@ -1,87 +1,125 @@
-import csv, os, pickle
-import threading, Queue
+import csv, os, pickle, shutil
 import collections
+import argparse, multiprocessing
 
-#
-paperId = {}
-paperTitle = {}
-paperYear = {}
-paperCid = {}
-paperJid = {}
-
-#
-confName = {}
-jourName = {}
-
-#
-paperAuthor = {}
-authorPaper = {}
-
-#
-print '[*] Read Paper.csv'
-if os.path.isfile('compressed_data/dm_pickle/paper.dat'):
-  with open('compressed_data/dm_pickle/paper.dat', 'rb') as f:
-    paperId    = pickle.load(f)
-    paperTitle = pickle.load(f)
-    paperYear  = pickle.load(f)
-    paperCid   = pickle.load(f)
-    paperJid   = pickle.load(f)
+import time
+import numpy as np
 
-    print ' # Load pickle instead'
-else:
-  with open('original_data/Paper.csv', 'rb') as csvFile:
-    reader = csv.reader(csvFile)
-
-    with open('compressed_data/Paper.csv', 'wb') as csvOut:
-      writer = csv.writer(csvOut, delimiter=',')
-      writer.writerow(reader.next())
-
-      for row in reader:
-        pid   = int(row[0])
-        title = row[1]
-        year  = int(row[2])
-        cid  = int(row[3])
-        jid  = int(row[4])
-
-        if len(title) > 0 and year >= 1900 and year <= 2013 and (cid > 0 or jid > 0):
-          paperId[pid] = 1
-          paperTitle[pid] = title
-          paperYear[pid]  = year
-          paperCid[pid]   = cid
-          paperJid[pid]   = jid
-
-          writer.writerow([pid, title, year, cid, jid, ''])
-
-  with open('compressed_data/dm_pickle/paper.dat', 'wb') as f:
-    pickle.dump(paperId, f)
-    pickle.dump(paperTitle, f)
-    pickle.dump(paperYear, f)
-    pickle.dump(paperCid, f)
-    pickle.dump(paperJid, f)
+import metrics, pipeline, csvio, compression
+from metrics import timed
+
+PAPER_AUTHOR_COLUMNS = [(0, csvio.INT), (1, csvio.INT)]
+
+outputSuffix = ''  # extension of compressed_data csv files, e.g. '.gz', set by --compress
+
+
+def outputPath(csvName):
+  """
+  Return compressed_data path of csvName, compressed by outputSuffix
+  """
+  return 'compressed_data/' + csvName + outputSuffix
+
+
+def cached(path):
+  """
+  Return True if pickle path exists, counted as a cache hit or miss
+  """
+  found = os.path.isfile(path)
+  metrics.count('cache.hits' if found else 'cache.misses')
+  return found
+
+
+class Index:
+  """
+  Id sets shared by every filter, built once
+  """
+  def __init__(self):
+    self.paperIds  = set()  # papers kept in compressed Paper.csv
+    self.confIds   = set()  # conferences of kept papers
+    self.jourIds   = set()  # journals of kept papers
+    self.authorIds = set()  # authors of kept papers
+    self.arrays = {}        # name -> (id set, its ids as a sorted int64 array), see member()
+
+
+  def member(self, name, values):
+    """
+    Return bool mask of values in id set self.<name>, looked up by binary
+    search in an array sorted once per set
+    """
+    ids = getattr(self, name)
+    cached = self.arrays.get(name)
+    if cached is None or cached[0] is not ids or len(cached[1]) != len(ids):
+      cached = self.arrays[name] = (ids, np.sort(np.fromiter(ids, dtype=np.int64, count=len(ids))))
+    array = cached[1]
+
+    values = np.asarray(values, dtype=np.int64)
+    if len(array) == 0:
+      return np.zeros(values.shape, dtype=bool)
+    found = np.minimum(np.searchsorted(array, values), len(array) - 1)
+    return array[found] == values
+
+
+@timed
+def compressPaper(index):
+  if cached('compressed_data/dm_pickle/paper_ids.dat'):
+    with open('compressed_data/dm_pickle/paper_ids.dat', 'rb') as f:
+      index.paperIds = pickle.load(f)
+      index.confIds  = pickle.load(f)
+      index.jourIds  = pickle.load(f)
+
+      print ' # Load pickle instead'
+      return 0
+
+  count = 0
+  path = 'original_data/Paper.csv'
+  columns = [(0, csvio.INT), (1, csvio.STR), (2, csvio.INT), (3, csvio.INT), (4, csvio.INT)]
+
+  with compression.openFile(outputPath('Paper.csv'), 'wb') as csvOut:
+    writer = csv.writer(csvOut, delimiter=',')
+    writer.writerow(csvio.readHeader(path))
+
+    for pids, titles, years, cids, jids in csvio.readColumns(path, columns):
+      count += len(pids)
+      hasTitle = np.array([len(title) > 0 for title in titles], dtype=bool)
+      keep = hasTitle & (years >= 1900) & (years <= 2013) & ((cids > 0) | (jids > 0))
+
+      index.paperIds.update(pids[keep].tolist())
+      index.confIds.update(cids[keep].tolist())
+      index.jourIds.update(jids[keep].tolist())
+
+      kept = np.flatnonzero(keep).tolist()
+      writer.writerows(zip(pids[keep].tolist(), [titles[i] for i in kept], years[keep].tolist(),
+                           cids[keep].tolist(), jids[keep].tolist(), [''] * len(kept)))
+
+  with open('compressed_data/dm_pickle/paper_ids.dat', 'wb') as f:
+    pickle.dump(index.paperIds, f, pickle.HIGHEST_PROTOCOL)
+    pickle.dump(index.confIds, f, pickle.HIGHEST_PROTOCOL)
+    pickle.dump(index.jourIds, f, pickle.HIGHEST_PROTOCOL)
 
     print ' # Dump pickle'
+  return count
 
-#
-print '[*] Read Conference.csv'
-if os.path.isfile('compressed_data/dm_pickle/conference.dat'):
-  with open('compressed_data/dm_pickle/conference.dat', 'rb') as f:
-    confName = pickle.load(f)
 
+@timed
+def compressConference(index):
+  if cached('compressed_data/dm_pickle/conference.dat'):
     print ' # Load pickle instead'
-else:
-  with open('original_data/Conference.csv', 'rb') as f:
-    reader = csv.reader(f)
+    return 0
 
-    with open('compressed_data/Conference.csv', 'wb') as csvOut:
-      writer = csv.writer(csvOut, delimiter=',')
-      writer.writerow(reader.next())
+  count = 0
+  confName = {}
+  path = 'original_data/Conference.csv'
+  with compression.openFile(outputPath('Conference.csv'), 'wb') as csvOut:
+    writer = csv.writer(csvOut, delimiter=',')
+    writer.writerow(csvio.readHeader(path))
 
-      for row in reader:
-        cid  = int(row[0])
-        full = row[2]
+    for cids, fulls in csvio.readColumns(path, [(0, csvio.INT), (2, csvio.STR)]):
+      count += len(cids)
+      known = index.member('confIds', cids)
 
+      for cid, full, inPaper in zip(cids.tolist(), fulls, known.tolist()):
         if len(full) > 0:
-          if cid in paperCid.values():
+          if inPaper:
             confName[cid] = full
 
             writer.writerow([cid, '', full, ''])
@@ -91,29 +129,30 @@ else:
   with open('compressed_data/dm_pickle/conference.dat', 'wb') as f:
     pickle.dump(confName, f)
     print ' # Dump pickle'
+  return count
 
-#
-print '[*] Read Journal.csv'
-if os.path.isfile('compressed_data/dm_pickle/journal.dat'):
-  with open('compressed_data/dm_pickle/journal.dat', 'rb') as f:
-    jourName = pickle.load(f)
 
+@timed
+def compressJournal(index):
+  if cached('compressed_data/dm_pickle/journal.dat'):
     print ' # Load pickle instead'
-else:
-  with open('original_data/Journal.csv', 'rb') as csvFile:
-    reader = csv.reader(csvFile)
+    return 0
 
-    with open('compressed_data/Journal.csv', 'wb') as csvOut:
-      writer = csv.writer(csvOut, delimiter=',')
-      writer.writerow(reader.next())
+  count = 0
+  jourName = {}
+  path = 'original_data/Journal.csv'
+  with compression.openFile(outputPath('Journal.csv'), 'wb') as csvOut:
+    writer = csv.writer(csvOut, delimiter=',')
+    writer.writerow(csvio.readHeader(path))
 
-      for row in reader:
-        jid  = int(row[0])
-        full = row[2]
+    for jids, fulls in csvio.readColumns(path, [(0, csvio.INT), (2, csvio.STR)]):
+      count += len(jids)
+      known = index.member('jourIds', jids)
 
+      for jid, full, inPaper in zip(jids.tolist(), fulls, known.tolist()):
         if len(full) > 0:
-          if jid in paperJid.values():
-            jourName[cid] = full
+          if inPaper:
+            jourName[jid] = full
 
             writer.writerow([jid, '', full, ''])
           #else:
@@ -122,174 +161,335 @@ else:
   with open('compressed_data/dm_pickle/journal.dat', 'wb') as f:
     pickle.dump(jourName, f)
     print ' # Dump pickle'
+  return count
 
-#
-print '[*] Read PaperAuthor.csv'
-if os.path.isfile('compressed_data/dm_pickle/paperauthor.dat'):
-  with open('compressed_data/dm_pickle/paperauthor.dat', 'rb') as f:
-    paperAuthor = pickle.load(f)
-    authorPaper = pickle.load(f)
-    print ' # Load pickle instead'
-else:
-  with open('original_data/PaperAuthor.csv', 'rb') as csvFile:
-    reader = csv.reader(csvFile)
-
-    with open('compressed_data/PaperAuthor.csv', 'wb') as csvOut:
-      writer = csv.writer(csvOut, delimiter=',')
-      writer.writerow(reader.next())
 
-      p2amap = collections.defaultdict(list)
-      a2pmap = collections.defaultdict(list)
+def filterPaperAuthor(chunk, writer, index):
+  """
+  Write rows of PAPER_AUTHOR_COLUMNS chunk of papers in index,
+  return (# rows, authorIds written)
+  """
+  pids, aids = chunk
+  keep = index.member('paperIds', pids)
+  pids, aids = pids[keep].tolist(), aids[keep].tolist()
 
-      for row in reader:
-        pid = int(row[0])
-        aid = int(row[1])
+  writer.writerows(zip(pids, aids, [''] * len(pids), [''] * len(pids)))
+  return len(keep), set(aids)
 
-        if pid in paperId:
-          # key = pid, value = aid
-          p2amap[pid].append(aid)
 
-          # key = aid, value = pid
-          a2pmap[aid].append(pid)
+@timed
+def compressPaperAuthor(index, workers=1):
+  if cached('compressed_data/dm_pickle/paperauthor_ids.dat'):
+    with open('compressed_data/dm_pickle/paperauthor_ids.dat', 'rb') as f:
+      index.authorIds = pickle.load(f)
+      print ' # Load pickle instead'
+      return 0
 
-          writer.writerow([pid, aid, '', ''])
-        #else:
-        #  print pid, 'is not in Paper.csv'
-      paperAuthor = p2amap
-      authorPaper = a2pmap
+  # Byte ranges of a compressed file can not be read on their own
+  if workers > 1 and compression.codecOf(compression.find('original_data/PaperAuthor.csv')) is None:
+    count, index.authorIds = filterParallel('PaperAuthor.csv', filterPaperAuthor, PAPER_AUTHOR_COLUMNS, index, workers)
+  else:
+    count, index.authorIds = filterPipelined('PaperAuthor.csv', filterPaperAuthor, PAPER_AUTHOR_COLUMNS, index)
 
-  with open('compressed_data/dm_pickle/paperauthor.dat', 'wb') as f:
-    pickle.dump(paperAuthor,f)
-    pickle.dump(authorPaper,f)
+  with open('compressed_data/dm_pickle/paperauthor_ids.dat', 'wb') as f:
+    pickle.dump(index.authorIds, f, pickle.HIGHEST_PROTOCOL)
 
     print ' # Dump pickle'
-
-#
-"""
-print '[*] Read Train.csv'
-with open('original_data/Train.csv', 'rb') as csvFile:
-  reader = csv.reader(csvFile)
-
-  with open('compressed_data/Train.csv', 'wb') as csvOut:
-    writer = csv.writer(csvOut, delimiter=',')
-    writer.writerow(reader.next())
-
-    for row in reader:
-      aid       = int(row[0])
-      confirmed = map(int, row[1].split())
-      deleted   = map(int, row[2].split())
-
-      if aid in authorPaper:
-        dconfirmed = []
-        ddeleted   = []
-
-        for pid in confirmed:
-          if pid in paperId:
-            dconfirmed.append(pid)
-
-        for pid in deleted:
-          if pid in paperId:
-            ddeleted.append(pid)
-
-        if len(dconfirmed) > 0 and len(ddeleted) > 0:
-          dconfirmed = [str(i) for i in dconfirmed]
-          dconfirmed = " ".join(dconfirmed)
-          ddeleted   = [str(i) for i in ddeleted]
-          ddeleted   = " ".join(ddeleted)
-          writer.writerow([aid, dconfirmed, ddeleted])
-        else:
-          print 'Lack of data of %d: len(Confirm) = %d, len(Delete) = %d' % \
-                  (aid, len(dconfirmed), len(ddeleted))
-
-      else:
-        print aid, 'is not in PaperAuthor.csv'
-"""
-
-print '[*] Read Valid.csv'
-with open('original_data/Valid.csv', 'rb') as csvFile:
-  reader = csv.reader(csvFile)
-
-  with open('compressed_data/Valid.csv', 'wb') as csvOut:
+  return count
+
+
+def lineChunks(path, count):
+  """
+  Return [(start, end)] byte ranges of rows after the column names, split at
+  line boundaries outside quoted fields. A line ending after an odd number of
+  quotes is inside a field, like a newline in a title, and the range is extended
+  """
+  size = os.path.getsize(path)
+
+  with open(path, 'rb') as f:
+    quotes = f.readline().count('"')  # quotes before f.tell()
+    bounds = [f.tell()]
+    step = max(1, (size - bounds[0]) / count)
+
+    for i in range(1, count):
+      end = bounds[0] + i * step - 1
+      if f.tell() > end:
+        continue
+      while f.tell() < end:
+        quotes += f.read(min(1 << 20, end - f.tell())).count('"')
+
+      line = f.readline()
+      quotes += line.count('"')
+      while quotes % 2 == 1 and line:
+        line = f.readline()
+        quotes += line.count('"')
+
+      if f.tell() >= size:
+        break
+      if f.tell() > bounds[-1]:
+        bounds.append(f.tell())
+
+  bounds.append(size)
+  return zip(bounds[:-1], bounds[1:])
+
+
+def readRange(path, start, end):
+  """
+  Yield lines starting in [start, end)
+  """
+  with open(path, 'rb') as f:
+    f.seek(start)
+    while f.tell() < end:
+      line = f.readline()
+      if not line:
+        break
+      yield line
+
+
+class RowBuffer:
+  """
+  csv writer keeping rows for a writer thread
+  """
+  def __init__(self):
+    self.rows = []
+
+
+  def writerow(self, row):
+    self.rows.append(row)
+
+
+  def writerows(self, rows):
+    self.rows.extend(rows)
+
+
+def filterPipelined(csvName, function, columns, index, chunkSize=50000):
+  """
+  Filter original_data/csvName into compressed_data/csvName, typed columns
+  parsed on a reader thread and kept rows written on a writer thread.
+  Return (# rows, union of ids returned by function)
+  """
+  path = 'original_data/' + csvName
+  header = csvio.readHeader(path)
+
+  def compute(chunk):
+    buffer = RowBuffer()
+    count, ids = function(chunk, buffer, index)
+    return count, ids, buffer.rows
+
+  total = [0]
+  ids = set()
+  with compression.openFile(outputPath(csvName), 'wb') as csvOut:
     writer = csv.writer(csvOut, delimiter=',')
-    writer.writerow(reader.next())
-
-    for row in reader:
-      aid     = int(row[0])
-      unknown = map(int, row[1].split())
+    writer.writerow(header)
 
-      if aid in authorPaper:
-        dunknown = []
+    def write(result):
+      total[0] += result[0]
+      ids.update(result[1])
+      writer.writerows(result[2])
 
-        for pid in unknown:
-          if pid in paperId:
-            dunknown.append(pid)
+    pipeline.run(csvio.readColumns(path, columns, chunkSize), compute, write)
+  return total[0], ids
 
-        if len(dunknown) > 0:
-          dunknown = [str(i) for i in dunknown]
-          dunknown = " ".join(dunknown)
-          writer.writerow([aid, dunknown])
-        else:
-          print 'Lack of data of %d: len(Unknown) = 0' % aid
 
-      else:
-        print aid, 'is not in PaperAuthor.csv'
+_index = None  # Index of forked workers
 
-print '[*] Read ValidSolution.csv'
-with open('original_data/ValidSolution.csv', 'rb') as csvFile:
-  reader = csv.reader(csvFile)
+def filterChunk(task):
+  """
+  Run filter(chunk, writer, _index) on typed columns of a byte range, write
+  rows to part file. Byte ranges are parsed by the csv module
+  """
+  function, columns, path, start, end, partPath = task
 
-  with open('compressed_data/ValidSolution.csv', 'wb') as csvOut:
+  count = 0
+  ids = set()
+  with open(partPath, 'wb') as csvOut:
     writer = csv.writer(csvOut, delimiter=',')
-    writer.writerow(reader.next())
-
-    for row in reader:
-      aid     = int(row[0])
-      confirmed = map(int, row[1].split())
-
-      if aid in authorPaper:
-        dconfirmed = []
-
-        for pid in confirmed:
-          if pid in paperId:
-            dconfirmed.append(pid)
-
-        if len(dconfirmed) > 0:
-          dconfirmed = [str(i) for i in dconfirmed]
-          dconfirmed = " ".join(dconfirmed)
-          writer.writerow([aid, dconfirmed])
-        else:
-          print 'Lack of data of %d: len(Confirm) = 0' % aid
-
-      else:
-        print aid, 'is not in PaperAuthor.csv'
-
-print '[*] Read Test.csv'
-with open('original_data/Test.csv', 'rb') as csvFile:
-  reader = csv.reader(csvFile)
-
-  with open('compressed_data/Test.csv', 'wb') as csvOut:
+    for chunk in csvio.columnChunks(csv.reader(readRange(path, start, end)), columns):
+      rows, kept = function(chunk, writer, _index)
+      count += rows
+      ids.update(kept)
+  return count, ids
+
+
+def filterParallel(csvName, function, columns, index, workers):
+  """
+  Filter original_data/csvName in line-aligned chunks with a process pool,
+  concatenate part files in order into compressed_data/csvName.
+  Return (# rows, union of ids returned by function)
+  """
+  global _index
+  _index = index
+
+  path = 'original_data/' + csvName
+  outPath = outputPath(csvName)
+  tasks = [(function, columns, path, start, end, 'compressed_data/%s.part%05d' % (csvName, i)) \
+           for i, (start, end) in enumerate(lineChunks(path, workers * 4))]
+
+  pool = multiprocessing.Pool(workers)
+  try:
+    results = pool.map(filterChunk, tasks, chunksize=1)
+  finally:
+    pool.close()
+    pool.join()
+    _index = None
+
+  with open(path, 'rb') as csvFile:
+    header = csvFile.readline()
+
+  with compression.openFile(outPath, 'wb') as csvOut:
+    csv.writer(csvOut, delimiter=',').writerow(next(csv.reader([header])))
+    for task in tasks:
+      with open(task[5], 'rb') as part:
+        shutil.copyfileobj(part, csvOut, 1 << 20)
+      os.remove(task[5])
+
+  count = 0
+  ids = set()
+  for rows, kept in results:
+    count += rows
+    ids.update(kept)
+  return count, ids
+
+
+def compressIdLists(csvName, index, labels):
+  """
+  AuthorId, PaperIds [, PaperIds]
+  Keep authors in PaperAuthor.csv and papers in Paper.csv.
+  An author is written only if every id list is non-empty
+  """
+  count = 0
+  path = 'original_data/' + csvName
+  columns = [(0, csvio.INT)] + [(column, csvio.IDS) for column in range(1, len(labels) + 1)]
+
+  with compression.openFile(outputPath(csvName), 'wb') as csvOut:
     writer = csv.writer(csvOut, delimiter=',')
-    writer.writerow(reader.next())
+    writer.writerow(csvio.readHeader(path))
 
-    for row in reader:
-      aid     = int(row[0])
-      unknown = map(int, row[1].split())
+    for chunk in csvio.readColumns(path, columns):
+      aids = chunk[0]
+      count += len(aids)
+      known = index.member('authorIds', aids).tolist()
 
-      if aid in authorPaper:
-        dunknown = []
+      # Papers in Paper.csv of every id list, in order of the row
+      lists = [ids.select(index.member('paperIds', ids.ids)).tolists() for ids in chunk[1:]]
 
-        for pid in unknown:
-          if pid in paperId:
-            dunknown.append(pid)
+      for row, aid in enumerate(aids.tolist()):
+        if known[row]:
+          kept = [pids[row] for pids in lists]
 
-        if len(dunknown) > 0:
-          dunknown = [str(i) for i in dunknown]
-          dunknown = " ".join(dunknown)
-          writer.writerow([aid, dunknown])
-        else:
-          print 'Lack of data of %d: len(Unknown) = 0' % aid
+          if all(len(pids) > 0 for pids in kept):
+            writer.writerow([aid,] + [" ".join([str(i) for i in pids]) for pids in kept])
+          else:
+            print 'Lack of data of %d: ' % aid + \
+                  ', '.join(['len(%s) = %d' % (label, len(pids)) for label, pids in zip(labels, kept)])
 
-      else:
-        print aid, 'is not in PaperAuthor.csv'
-
-print '[*] Done'
+        else:
+          print aid, 'is not in PaperAuthor.csv'
+
+  return count
+
+
+def compressIdListsTask(task):
+  """
+  compressIdLists in a forked worker, return (stage, seconds, # rows)
+  """
+  stage, csvName, labels = task
+  start = time.time()
+  count = compressIdLists(csvName, _index, labels)
+  return stage, time.time() - start, count
+
+
+@timed
+def compressTrain(index):
+  return compressIdLists('Train.csv', index, ['Confirm', 'Delete'])
+
+@timed
+def compressValid(index):
+  return compressIdLists('Valid.csv', index, ['Unknown'])
+
+@timed
+def compressValidSolution(index):
+  return compressIdLists('ValidSolution.csv', index, ['Confirm'])
+
+@timed
+def compressTest(index):
+  return compressIdLists('Test.csv', index, ['Unknown'])
+
+
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--workers', type=int, default=1,
+                      help='filter PaperAuthor.csv in chunks and Valid/ValidSolution/Test concurrently')
+  parser.add_argument('--compress', choices=['gz', 'bz2', 'xz'], default=None,
+                      help='compress compressed_data/*.csv. original_data/*.csv may be read from .gz/.bz2/.xz files')
+  parser.add_argument('--reader', choices=sorted(csvio.readers), default=csvio.default,
+                      help='csv parser, pandas (vectorized, if installed) or the csv module')
+  parser.add_argument('--metrics', default=None,
+                      help='json report of stage timings and counters, compressed_data/metrics.json.<time> by default')
+  parser.add_argument('--profile', default=None, metavar='STAGE',
+                      help='run STAGE (e.g. compressPaper) under cProfile, statistics written next to the report')
+  args = parser.parse_args()
+  csvio.setDefault(args.reader)
+  global outputSuffix
+  if args.compress is not None:
+    outputSuffix = '.' + args.compress
+
+  if not os.path.exists('compressed_data/dm_pickle'):
+    os.makedirs('compressed_data/dm_pickle')
+
+  report = args.metrics or 'compressed_data/metrics.json.' + time.strftime('%Y-%m-%d %H:%M:%S')
+  if args.profile is not None:
+    metrics.default.profile(args.profile, report + '.prof')
+
+  index = Index()
+
+  print '[*] Read Paper.csv'
+  compressPaper(index)
+
+  print '[*] Read Conference.csv'
+  compressConference(index)
+
+  print '[*] Read Journal.csv'
+  compressJournal(index)
+
+  print '[*] Read PaperAuthor.csv'
+  compressPaperAuthor(index, args.workers)
+
+  #print '[*] Read Train.csv'
+  #compressTrain(index)
+
+  if args.workers > 1:
+    print '[*] Read Valid.csv, ValidSolution.csv, Test.csv'
+    global _index
+    _index = index
+
+    pool = multiprocessing.Pool(min(args.workers, 3))
+    try:
+      results = pool.map(compressIdListsTask, [('compressValid', 'Valid.csv', ['Unknown']),
+                                               ('compressValidSolution', 'ValidSolution.csv', ['Confirm']),
+                                               ('compressTest', 'Test.csv', ['Unknown'])], chunksize=1)
+    finally:
+      pool.close()
+      pool.join()
+      _index = None
+
+    for stage, seconds, count in results:
+      metrics.record(stage, seconds, count)
+  else:
+    print '[*] Read Valid.csv'
+    compressValid(index)
+
+    print '[*] Read ValidSolution.csv'
+    compressValidSolution(index)
+
+    print '[*] Read Test.csv'
+    compressTest(index)
+
+  metrics.default.printSummary()
+  metrics.default.save(report)
+  print '[*] Metrics in %s' % report
+
+  print '[*] Done'
+
+if __name__ == "__main__":
+  main()
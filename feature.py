@@ -1,20 +1,22 @@
-import csv, os, datetime
+import os, datetime
 import re, math, operator
-import collections, pickle
+import collections, functools
+import argparse, multiprocessing
 
-import jellyfish
+import numpy as np
 from nltk.corpus import stopwords
 
-import time
-def runtime(function):
-  def wrap(*arg):
-    start = time.time()
-    r = function(*arg)
-    end = time.time()
-    print "%s (%0.3f ms)" % (function.func_name, (end-start)*1000)
-    return r
-  return wrap
-
+import stream, metrics, pipeline, csvio, compression
+from stream import SpillDict, DictSink, ArraySink, FunctionSink
+from graphstore import GraphStore
+from cache import CacheManager
+from similarity import SimilarityEngine, unicodeDistance, profileBytes
+from lru import LRUCache
+from neighbors import NeighborIndex
+from featurestore import FeatureOutput
+from strtable import StringTable
+from idmap import IdMap, IdArray
+from tokenizer import Tokenizer
 
 def charFilter(string):
   """
@@ -23,6 +25,13 @@ def charFilter(string):
   return re.sub('[^a-z ]', '', string)
 
 
+def stripWords(string, stopword):
+  """
+  Lowercase, ignore non-alphabet and remove stopword
+  """
+  return " ".join([w for w in charFilter(string.lower()).split() if not w in stopword])
+
+
 def euclidean_distance(p, q):
   """
   Return distance between two points
@@ -77,16 +86,7 @@ def stringDistance(str1, str2):
   """
   distance = 0
   if len(str1) > 0 and len(str2) > 0:
-    str1 = str1.decode('utf-8')
-    str2 = str2.decode('utf-8')
-
-    jaro = jellyfish.jaro_distance(str1, str2)
-    leven = jellyfish.levenshtein_distance(str1, str2)
-    damerau = jellyfish.damerau_levenshtein_distance(str1, str2)
-
-    norm = max(len(str1), len(str2))
-    distance = 0.5 * jaro + 0.25 * (1 - leven / norm)   \
-                          + 0.25 * (1 - damerau / norm)
+    distance = unicodeDistance(str1.decode('utf-8'), str2.decode('utf-8'))
 
   return distance
 
@@ -119,16 +119,124 @@ def publicationCmp(paper, publications):
   else:
     return mean
 
+FEATURE_IDS = ['AuthorId', 'PaperId', 'mark']  # int64 columns of feature output
+
+# Typed csv columns read by parsePaper / parsePaperAuthor
+PAPER_COLUMNS = [(0, csvio.INT), (1, csvio.STR), (2, csvio.INT), (3, csvio.INT), (4, csvio.INT)]
+PAPER_AUTHOR_COLUMNS = [(0, csvio.INT), (1, csvio.INT), (3, csvio.STR)]
+
+CODE_VERSION = 7  # bump when parsing or normalization of cached tables changes
+
 def ddInt():
   return collections.defaultdict(int)
 
-class Data:
-  def __init__ (self, runDir):
+
+stageGraph = collections.OrderedDict()  # stage -> (Data method, stages it depends on)
+
+def stage(name, *deps):
+  """
+  Register a Data method as stage name, its dependencies run first
+  """
+  def decorate(function):
+    stageGraph[name] = (function.func_name, deps)
+
+    @functools.wraps(function)
+    def wrap(self, *args, **kw):
+      self.require(*deps)
+      self.running.add(name)
+      try:
+        r = function(self, *args, **kw)
+      finally:
+        self.running.discard(name)
+      self.done.add(name)
+      return r
+    return wrap
+  return decorate
+
+
+class LazyTable(object):
+  """
+  Data table loaded on first access, from the cache artifact deferred by its
+  stage or by running the stage. Once set, the instance attribute hides this
+  """
+  def __init__(self, stage):
+    self.stage = stage
+    self.name = None  # set after class Data
+
+
+  def __get__(self, data, owner):
+    if data is None:
+      return self
+    if self.name not in data.deferred:
+      data.require(self.stage)
+    if self.name in data.deferred:
+      data.loadDeferred(self.name)
+    if self.name not in data.__dict__:
+      raise AttributeError('%s is not set by stage %s' % (self.name, self.stage))
+    return data.__dict__[self.name]
+
+
+_shared = None  # Data of forked feature workers
+
+def featureBatch(task):
+  """
+  Run Data.<method> on a batch of authors, in a worker or in the calling process.
+  Return (feature rows, [(authorId, state)], counters of the batch)
+  """
+  method, authors = task
+  rows, states = [], []
+
+  before = _shared.counters()
+  for author in authors:
+    authorRows, state = getattr(_shared, method)(*author)
+    rows.extend(authorRows)
+    states.append((author[0], state))
+
+  after = _shared.counters()
+  return rows, states, [(name, after[name] - before[name]) for name in after]
+
+
+class Data(object):
+  # Author.csv, merged with PaperAuthor.csv
+  authorAffiliation = LazyTable('paperauthor')  # authorId -> authorAffiliation, StringTable
+
+  # Paper.csv, indexed by self.papers
+  papers       = LazyTable('paper')  # IdMap: paperId -> dense index
+  paperTitle   = LazyTable('paper')  # paperId -> paperTitle, StringTable
+  paperYear    = LazyTable('paper')  # IdArray: paperId -> normalized paperYear
+  paperPublish = LazyTable('paper')  # IdArray: paperId -> conferenceId/journalId
+
+  # Conferene.csv, Journal.csv
+  publishName = LazyTable('journal')     # conferenceId/journalId -> conferenceName/journalName, StringTable
+  journalPad  = LazyTable('conference')  # max(conferenceId)
+
+  # PaperAuthor.csv
+  graph = LazyTable('paperauthor')  # GraphStore: paperId -> authorIds, authorId -> paperIds,
+                                    #             authorId, conferenceId/journalId -> # papers
+
+  # Train.csv
+  confirmed  = LazyTable('train')  # authorId -> confirmedPaperIds
+  deleted    = LazyTable('train')  # authorId -> deletedPaperIds
+  trainYear  = LazyTable('train')  # authorId -> mean of confirmed paperYear
+  trainCount = LazyTable('train')  # authorId, conferenceId/journalId -> # confirmed papers
+
+  # Test.csv
+  unknown = LazyTable('test')  # authorId -> unknown paperIds
+
+  def __init__ (self, runDir, similarityMode='exact', cacheMB=512, memoryMB=None, output='npy', compress=None):
     self.dataDir = runDir + '/original_data/'
     self.pickleDir = runDir + '/pickles/'
     self.resultDir = runDir + '/preprocess/'
     self.stopword = stopwords.words('english')  # remove high-frequency words
+    self.tokenizer = Tokenizer(self.stopword)
     self.currentTime = str(datetime.datetime.now())
+    self.memoryMB = memoryMB  # spill parsed tables to pickleDir above this RSS
+    self.output = output  # features written as 'npy' directory, 'csv' file or 'both'
+    self.compress = compress  # 'gz', 'bz2' or 'xz' compression of csv features, None for plain csv
+    # paper vs. publications, (pid, pid) scores and author profiles share cacheMB
+    self.similarity = SimilarityEngine(similarityMode, LRUCache(cacheMB * 2 ** 19))
+    self.similarityReady = False
+    self.profileCache = LRUCache(cacheMB * 2 ** 19, profileBytes)  # authorId -> profile
 
     if not os.path.exists(self.dataDir):
       os.makedirs(self.dataDir)
@@ -137,470 +245,561 @@ class Data:
     if not os.path.exists(self.resultDir):
       os.makedirs(self.resultDir)
 
-    # Author.csv
-    self.authorAffiliation = collections.defaultdict(str)  # authorId -> authorAffiliation
+    self.cache = CacheManager(self.pickleDir, CODE_VERSION)
 
-    # Paper.csv
-    self.paperTitle   = collections.defaultdict(str)  # paperId -> paperTitle
-    self.paperYear    = collections.defaultdict(int)  # paperId -> paperYear
-    self.paperPublish = {}                            # paperId -> conferenceId/journalId
-
-    # Conferene.csv, Journal.csv
-    self.publishName = collections.defaultdict(str)  # conferenceId/journalId -> conferenceName/journalName
-    self.journalPad  = 0   # max(conferenceId)
-
-    # PaperAuthor.csv
-    self.paperCoAuthors     = collections.defaultdict(dict)  # paperId -> authorIds
-    self.authorPublications = collections.defaultdict(dict)  # authorId -> paperIds
-    self.authorPublishCount = collections.defaultdict(ddInt)  # authorId, conferenceId/journalId -> # papers
-
-    # Train.csv
-    self.confirmed  = collections.defaultdict(list)  # authorId -> confirmedPaperIds
-    self.deleted    = collections.defaultdict(list)  # authorId -> deletedPaperIds
-    self.trainYear  = collections.defaultdict(int)    # authorId -> mean of confirmed paperYear
-    self.trainCount = collections.defaultdict(ddInt)  # authorId, conferenceId/journalId -> # confirmed papers
-
-    # Test.csv
-    self.unknown = collections.defaultdict(list)  # authorId -> unknown paperIds
+    # Tables are LazyTable attributes of the class
+    self.done = set()      # stages run
+    self.running = set()   # stages running, to detect cycles
+    self.deferred = {}     # table -> (artifact, key, tables of artifact) loaded on first access
 
     self.minYear = 1900
     self.maxYear = 2013
 
 
-  @runtime
+  def __setattr__(self, name, value):
+    # A table set by its stage replaces a deferred artifact
+    self.__dict__.get('deferred', {}).pop(name, None)
+    object.__setattr__(self, name, value)
+
+
+  @stage('author')
+  @metrics.timed
   def readAuthor(self, csvFile='Author.csv', pickleFile='author.dat'):
     """
     AuthorId, Affiliation
     """
-    if os.path.isfile(self.pickleDir + pickleFile):
-      with open(self.pickleDir + pickleFile, 'rb') as f:
-        pickleAffiliation = pickle.load(f)
-
-        for k,v in pickleAffiliation.iteritems():
-          self.authorAffiliation[k] = v
-
-        print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
-
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
+    key = self.cache.key(pickleFile, [self.dataDir + csvFile], {'stopword': self.stopword})
+    if self.defer(pickleFile, key, ['authorAffiliation']):
+      print ' # Use %s instead of parsing %s' % (pickleFile, csvFile)
+      return
 
-      for row in reader:
-        aid = int(row[0])
-        aff = row[2].lower()
+    self.authorAffiliation = SpillDict(self.pickleDir + 'author.db', '')
+    def parse(chunk):
+      aids, affs = chunk
+      return [aids, [aff if len(aff) > 0 else None for aff in affs]]
 
-        if len(aff) > 0:
-          aff = charFilter(aff)
-          aff = " ".join([w for w in aff.split() if not w in self.stopword])
-          self.authorAffiliation[aid] = aff
+    stream.run(csvFile, self.dataDir + csvFile, [(0, csvio.INT), (2, csvio.STR)], parse,
+               [DictSink(self.authorAffiliation, 0, 1, self.tokenizer.normalizeMany)], self.memoryMB)
 
-    with open(self.pickleDir + pickleFile, 'wb') as f:
-      pickle.dump(self.authorAffiliation, f)
+    # Snapshot: mergeAffiliations changes the spilled shelve in place
+    self.cache.save(pickleFile, key, dict(self.authorAffiliation.iteritems()))
 
 
-  @runtime
-  def readPaper(self, csvFile='Paper.csv', pickleFile='paper.dat'):
+  @stage('paper', 'conference')
+  @metrics.timed
+  def readPaper(self, csvFile='Paper.csv', pickleFile='paper.dat', titleFile='paper_title.dat'):
     """
     PaperId, Title, Year, ConferenceId, JournalId, Keywords
     """
-    if os.path.isfile(self.pickleDir + pickleFile):
-      with open(self.pickleDir + pickleFile, 'rb') as f:
-        pickleTitle       = pickle.load(f)
-        pickleYear        = pickle.load(f)
-        self.paperPublish = pickle.load(f)
-
-        for k,v in pickleTitle.iteritems():
-          self.paperTitle[k] = v
-        for k,v in pickleYear.iteritems():
-          self.paperYear[k] = v
-
-        print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
-
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
-
-      for row in reader:
-        pid   = int(row[0])
-        title = row[1].lower()
-        year  = int(row[2])
-        cid   = int(row[3])
-        jid   = int(row[4])
-
-        # Remove error
-        if year < self.minYear:
-          self.paperYear[pid] = 0
-        elif year > self.maxYear:
-          self.paperYear[pid] = 1
-        else:
-          self.paperYear[pid] = (year - self.minYear) / float(self.maxYear - self.minYear)
-
-        # Merge conference and journal
-        if cid > 0:
-          self.paperPublish[pid] = cid
-        elif jid > 0:
-          self.paperPublish[pid] = jid + self.journalPad
+    key = self.cache.key(pickleFile, [self.dataDir + csvFile],
+                         {'stopword': self.stopword, 'minYear': self.minYear, 'maxYear': self.maxYear,
+                          'journalPad': self.journalPad})
+    if self.defer(pickleFile, key, ['papers', 'paperYear', 'paperPublish']) and \
+       self.defer(titleFile, key, ['paperTitle']):
+      print ' # Use %s, %s instead of parsing %s' % (pickleFile, titleFile, csvFile)
+      return
 
-        # Remove high-frequency words
-        if len(title) > 0:
-          title = charFilter(title)
-          title = " ".join([w for w in title.split() if not w in self.stopword])
-          self.paperTitle[pid] = title
+    self.paperTitle = SpillDict(self.pickleDir + 'paper_title.db', '')
+    columns = ArraySink(4, tmpDir=self.pickleDir)
+    stream.run(csvFile, self.dataDir + csvFile, PAPER_COLUMNS, self.parsePaper,
+               [columns, DictSink(self.paperTitle, 0, 4, self.tokenizer.normalizeMany)], self.memoryMB)
+    pids, years, cids, jids = columns.columns()
+
+    # Flat arrays share the dense index of Paper.csv ids
+    self.papers = IdMap.fromIds(pids)
+    self.paperYear = IdArray.fromColumns(pids, self.normalizeYears(years), np.nan, 0, self.papers)
+    self.paperPublish = IdArray.fromColumns(pids, self.mergeVenues(cids, jids), -1, None, self.papers)
+    self.paperTitle = self.intern(self.paperTitle, self.papers)
 
-    with open(self.pickleDir + pickleFile, 'wb') as f:
-      pickle.dump(self.paperTitle, f)
-      pickle.dump(self.paperYear, f)
-      pickle.dump(self.paperPublish, f)
+    self.cache.save(pickleFile, key, self.papers, self.paperYear, self.paperPublish)
+    self.cache.save(titleFile, key, self.paperTitle)
 
-  @runtime
-  def readConference(self, csvFile='Conference.csv', pickleFile='publish.dat'):
+  @stage('conference')
+  @metrics.timed
+  def readConference(self, csvFile='Conference.csv', pickleFile='conference.dat'):
     """
     ConferenceId, FullName
     """
-    if os.path.isfile(self.pickleDir + pickleFile):
-      with open(self.pickleDir + pickleFile, 'rb') as f:
-        pickeName = pickle.load(f)
-        self.journalPad = pickle.load(f)
-        self.journalPad = int(self.journalPad)
-
-        for k,v in pickeName.iteritems():
-          self.publishName[k] = v
-
-        print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
-
     stopwordConference = ['conference', 'international', 'workshop', \
                            'systems', 'ieee', 'symposium']
     stopwordConference += self.stopword
 
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
+    self.publishName = collections.defaultdict(str)
+    self.journalPad  = 0
 
-      for row in reader:
-        cid  = int(row[0])
-        full = row[2].lower()
+    key = self.cache.key(pickleFile, [self.dataDir + csvFile], {'stopword': stopwordConference})
+    cached = self.cache.load(pickleFile, key)
+    if cached is not None:
+      conferenceName, self.journalPad = cached
+      self.publishName.update(conferenceName)
 
-        if cid > self.journalPad:
-          self.journalPad = cid
+      print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
+      return
 
-        # Remove high-frequency words
-        if len(full) > 0:
-          full = charFilter(full)
-          full = " ".join([w for w in full.split() if not w in stopwordConference])
-          self.publishName[cid] = full
+    tokenizer = Tokenizer(stopwordConference)
+    def parse(chunk):
+      cids, fulls = chunk
+
+      # Remove high-frequency words
+      return [cids, [tokenizer.normalize(full) if len(full) > 0 else None for full in fulls]]
+
+    def pad(fields):
+      self.journalPad = max(self.journalPad, int(fields[0].max()))
+
+    conferenceName = {}
+    stream.run(csvFile, self.dataDir + csvFile, [(0, csvio.INT), (2, csvio.STR)], parse,
+               [DictSink(conferenceName), FunctionSink(pad)], self.memoryMB)
+    self.publishName.update(conferenceName)
 
+    self.cache.save(pickleFile, key, conferenceName, self.journalPad)
 
-  @runtime
-  def readJournal(self, csvFile='Journal.csv', pickleFile='publish.dat'):
+
+  @stage('journal', 'conference')
+  @metrics.timed
+  def readJournal(self, csvFile='Journal.csv', pickleFile='journal.dat'):
     """
-    JournalId, FullName
+    JournalId, FullName. Runs after readConference for journalPad
     """
-    if os.path.isfile(self.pickleDir + pickleFile):
-      print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-      return
-
     stopwordJournal = ['journal', 'international', 'research', \
                         'science', 'review', 'engineering']
     stopwordJournal += self.stopword
 
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
+    key = self.cache.key(pickleFile, [self.dataDir + csvFile],
+                         {'stopword': stopwordJournal, 'journalPad': self.journalPad})
+    cached = self.cache.load(pickleFile, key)
+    if cached is not None:
+      journalName, = cached
 
-      for row in reader:
-        jid  = int(row[0]) + self.journalPad
-        full = row[2].lower()
+      print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
+    else:
+      tokenizer = Tokenizer(stopwordJournal)
+      def parse(chunk):
+        jids, fulls = chunk
 
         # Remove high-frequency words
-        if len(full) > 0:
-          full = charFilter(full)
-          full = " ".join([w for w in full.split() if not w in stopwordJournal])
-          self.publishName[jid] = full
-
-    with open(self.pickleDir + pickleFile, 'wb') as f:
-      pickle.dump(self.publishName, f)
-      pickle.dump(self.journalPad , f)
-
-
-  @runtime
-  def readPaperAuthor(self, csvFile='PaperAuthor.csv', pickleFile='paperauthor.dat'):
-    """
-    PaperId, AuthorId
-    """
-    if os.path.isfile(self.pickleDir + pickleFile):
-      with open(self.pickleDir + pickleFile, 'rb') as f:
-        pickleCoAuthors    = pickle.load(f)
-        picklePublications = pickle.load(f)
-        picklePublishCount = pickle.load(f)
-
-        for k,v in pickleCoAuthors.iteritems():
-          self.paperCoAuthors[k] = v
-        for k,v in picklePublications.iteritems():
-          self.authorPublications[k] = v
-        for k,v in picklePublishCount.iteritems():
-          for kk,vv in v.iteritems():
-            self.authorPublishCount[k][kk] = vv
-
-        print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
-
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
-
-      for row in reader:
-        pid = int(row[0])
-        aid = int(row[1])
-        aff = row[3].lower()
-
-        # Affiliation
-        if len(aff) > 0:
-          aff = charFilter(aff)
-          aff = " ".join([w for w in aff.split() if not w in self.stopword])
-          if aid not in self.authorAffiliation:
-            self.authorAffiliation[aid] = aff
-          elif len(self.authorAffiliation[aid]) > len(aff):
-            pass
-          else:
-            self.authorAffiliation[aid] = aff
-
-        # Co-authors
-        self.paperCoAuthors[pid][aid] = 1
-
-        # Author's publications
-        self.authorPublications[aid][pid] = 1
-
-        # Count the number of papers published to conference / journal
-        for pid in self.authorPublications[aid]:
-          if pid in self.paperPublish:
-            cid = self.paperPublish[pid]
-            self.authorPublishCount[aid][cid] += 1
-
-        # Normalize
-        if len(self.authorPublishCount[aid]) > 0:
-          maxCount = max(self.authorPublishCount[aid].iteritems(), key=operator.itemgetter(1))[1]
-          minCount = min(self.authorPublishCount[aid].iteritems(), key=operator.itemgetter(1))[1]
-          if maxCount == minCount:
-            for cid in self.authorPublishCount[aid]:
-              self.authorPublishCount[aid][cid] = 1
-          else:
-            for cid in self.authorPublishCount[aid]:
-              self.authorPublishCount[aid][cid] -= minCount
-              self.authorPublishCount[aid][cid] /= float(maxCount - minCount)
-
-    with open(self.pickleDir + pickleFile, 'wb') as f:
-      pickle.dump(self.paperCoAuthors, f)
-      pickle.dump(self.authorPublications, f)
-      pickle.dump(self.authorPublishCount, f)
-
-
-  @runtime
-  def readTrain(self, csvFile='Train.csv', pickleFile='train.dat', outFile='preprocess.csv', refresh=0):
-    if os.path.isfile(self.pickleDir + pickleFile) and refresh is 0:
-      with open(self.pickleDir + pickleFile, 'rb') as f:
-        self.confirmed = pickle.load(f)
-        self.deleted   = pickle.load(f)
-        self.trainYear  = pickle.load(f)
-        self.trainCount = pickle.load(f)
-
-        print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
-
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
-
-      with open(self.resultDir + outFile + '.' + self.currentTime, 'wb') as csvOut:
-        writer = csv.writer(csvOut, delimiter=',')
-        writer.writerow(['AuthorId','PaperId','PaperYear','PublishCount', \
-                         'PaperTitle','Publish','mark'])
-
-        for row in reader:
-          if len(row) < 3:
-            continue
-          aid       = int(row[0])
-          confirmed = map(int, set(row[1].split()))
-          deleted   = map(int, set(row[2].split()))
-
-          authorInfo = self.getAuthorInfo(aid)
-          publicationInfo = self.getPublicationsInfo(aid)
-
-          for pid in confirmed:
-            # for testing
-            if pid in self.paperYear:
-              yearNorm = self.paperYear[pid]  # prevent auto-creation of pid
-            else:
-              yearNorm = 0
-
-            if pid in self.paperPublish:
-              cid = self.paperPublish[pid]
-              self.trainCount[aid][cid] += 1
-
-            self.trainYear[aid] += yearNorm
-
-            # for training
-            self.confirmed[aid].append(pid)
-
-            coauthorInfo = self.getCoAuthorsInfo(aid, pid)
-            authorSimilarity = coauthorCmp(authorInfo, coauthorInfo)
-
-            paperInfo = self.getPaperInfo(pid)
-            paperSimilarity = publicationCmp(paperInfo, publicationInfo)
-
-            writer.writerow([aid, pid, yearNorm] + authorSimilarity + paperSimilarity + [1,])
-
-          self.trainYear[aid] /= float(len(confirmed))
-
-          for pid in deleted:
-            self.deleted[aid].append(pid)
-
-            coauthorInfo = self.getCoAuthorsInfo(aid, pid)
-            authorSimilairty = coauthorCmp(authorInfo, coauthorInfo)
-
-            paperInfo = self.getPaperInfo(pid)
-            paperSimilarity = publicationCmp(paperInfo, publicationInfo)
-
-            if pid in self.paperYear:
-              yearNorm = self.paperYear[pid]  # prevent auto-creation of pid
-            else:
-              yearNorm = 0
-              
-            writer.writerow([aid, pid, yearNorm] + authorSimilarity + paperSimilarity + [-1,])
-
-    with open(self.pickleDir + pickleFile, 'wb') as f:
-      pickle.dump(self.confirmed, f)
-      pickle.dump(self.deleted, f)
-      pickle.dump(self.trainYear, f)
-      pickle.dump(self.trainCount, f)
-
-
-  @runtime
-  def readTest(self, csvFile='Test.csv', pickleFile='test.dat', outFile='preprocess_test.csv', refresh=1):
+        return [jids + self.journalPad, [tokenizer.normalize(full) if len(full) > 0 else None for full in fulls]]
+
+      journalName = {}
+      stream.run(csvFile, self.dataDir + csvFile, [(0, csvio.INT), (2, csvio.STR)], parse,
+                 [DictSink(journalName)], self.memoryMB)
+
+      self.cache.save(pickleFile, key, journalName)
+
+    self.publishName.update(journalName)
+    self.publishName = self.intern(self.publishName)
+
+
+  @stage('paperauthor', 'author', 'paper')
+  @metrics.timed
+  def readPaperAuthor(self, csvFile='PaperAuthor.csv', storeName='paperauthor', pickleFile='paperauthor.dat'):
+    """
+    PaperId, AuthorId, Affiliation. Runs after readAuthor and readPaper
+    """
+    key = self.cache.key(storeName, [self.dataDir + csvFile], {'stopword': self.stopword},
+                         ['author.dat', 'paper.dat'])
+    if self.cache.hasDir(storeName, key) and self.defer(pickleFile, key, ['authorAffiliation']):
+      self.graph = GraphStore.load(self.cache.path(storeName, key))
+
+      print ' # Load %s instead of parsing %s' % (storeName, csvFile)
+      return
+
+    # Phase 1: raw paper <-> author links only
+    links = ArraySink(2, tmpDir=self.pickleDir)
+    stream.run(csvFile, self.dataDir + csvFile, PAPER_AUTHOR_COLUMNS, self.parsePaperAuthor,
+               [links, FunctionSink(self.mergeAffiliations)], self.memoryMB)
+
+    # Phase 2: count the number of papers published to conference / journal
+    pids, aids = links.columns()
+    storeDir = self.cache.tempDir(storeName)
+    GraphStore.fromPairs(pids, aids, self.paperPublish).save(storeDir)
+    self.cache.commitDir(storeDir, storeName, key)
+    self.graph = GraphStore.load(self.cache.path(storeName, key))
+
+    # Affiliations merged from PaperAuthor.csv
+    self.authorAffiliation = self.intern(self.authorAffiliation)
+    self.cache.save(pickleFile, key, self.authorAffiliation)
+
+
+  @stage('train', 'journal', 'paper', 'paperauthor')
+  @metrics.timed
+  def readTrain(self, csvFile='Train.csv', pickleFile='train.dat', outFile='preprocess.csv', refresh=0, workers=1):
+    key = self.cache.key(pickleFile, [self.dataDir + csvFile], {}, ['paper.dat', 'paperauthor'])
+    if refresh is 0 and self.defer(pickleFile, key, ['confirmed', 'deleted', 'trainYear', 'trainCount']):
+      print ' # Use %s instead of parsing %s' % (pickleFile, csvFile)
+      return
+
+    self.confirmed  = collections.defaultdict(list)
+    self.deleted    = collections.defaultdict(list)
+    self.trainYear  = collections.defaultdict(int)
+    self.trainCount = collections.defaultdict(ddInt)
+
+    # Paper ids of each list in ascending order, duplicates removed. Rows
+    # without DeletedPaperIds are skipped
+    def parse(chunk):
+      aids, confirmed, deleted = chunk
+      return zip(aids.tolist(), confirmed.unique().tolists(), deleted.unique().tolists())
+
+    header = ['AuthorId','PaperId','PaperYear','PublishCount','PaperTitle','Publish','mark']
+    columns = [(0, csvio.INT), (1, csvio.IDS), (2, csvio.IDS)]
+    for aid, (confirmed, deleted, year, count) in \
+        self.writeFeatures('trainAuthor', self.dataDir + csvFile, columns, parse, outFile, header,
+                           FEATURE_IDS, workers, skipShort=True):
+      self.confirmed[aid].extend(confirmed)
+      self.deleted[aid].extend(deleted)
+      self.trainYear[aid] = year
+      for cid in count:
+        self.trainCount[aid][cid] += count[cid]
+
+    self.cache.save(pickleFile, key, self.confirmed, self.deleted, self.trainYear, self.trainCount)
+
+
+  @stage('test', 'journal', 'paper', 'paperauthor')
+  @metrics.timed
+  def readTest(self, csvFile='Test.csv', pickleFile='test.dat', outFile='preprocess_test.csv', refresh=1, workers=1):
     print csvFile, pickleFile, outFile, refresh
-    if os.path.isfile(self.pickleDir + pickleFile) and refresh is 0:
-      with open(self.pickleDir + pickleFile, 'rb') as f:
-        self.unknown = pickle.load(f)
-
-        print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
-
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
-
-      with open(self.resultDir + outFile + '.' + self.currentTime, 'wb') as csvOut:
-        writer = csv.writer(csvOut, delimiter=',')
-        writer.writerow(['AuthorId','PaperId','PaperYear','PublishCount', \
-                         'PaperTitle','Publish','mark'])
-
-        for row in reader:
-          aid     = int(row[0])
-          unknown = map(int, set(row[1].split()))
-
-          authorInfo = self.getAuthorInfo(aid)
-          publicationInfo = self.getPublicationsInfo(aid)
-
-          for pid in unknown:
-            self.unknown[aid].append(pid)
-
-            coauthorInfo = self.getCoAuthorsInfo(aid, pid)
-            authorSimilarity = coauthorCmp(authorInfo, coauthorInfo)
-
-            paperInfo = self.getPaperInfo(pid)
-            paperSimilarity = publicationCmp(paperInfo, publicationInfo)
-
-            if pid in self.paperYear:
-              yearNorm = self.paperYear[pid]
-            else:
-              yearNorm = 0
-              
-            writer.writerow([aid, pid, yearNorm] + authorSimilarity + paperSimilarity + [0,])
-
-    with open(self.pickleDir + pickleFile, 'wb') as f:
-      pickle.dump(self.unknown, f)
-
-
-  @runtime
-  def readTestFull(self, csvFile='Test.csv', pickleFile='testfull.dat', outFile='preprocess_testfull.csv'):
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()
-
-      with open(self.resultDir + outFile + '.' + self.currentTime, 'wb') as csvOut:
-        writer = csv.writer(csvOut, delimiter=',')
-        writer.writerow(['AuthorId','PaperId','KnonwAuthorId','Similarity'])
-
-        # Localize for performance
-        paperYear = self.paperYear
-        learned = self.confirmed
-        trainYear = self.trainYear
-        trainCount = self.trainCount
-        paperPublish = self.paperPublish
-
-        neighbority   = {}
-        neighborYear  = {}
-        neighborCount = {}
-
-        for row in reader:
-          aid  = int(row[0])
-          pids = map(int, set(row[1].split()))
-
-          # unknown
-          naff = self.authorAffiliation[aid]
-          nyear = 0
-          ncount = collections.defaultdict(int)
-          for pid in pids:
-            if pid in paperPublish:
-              cid = paperPublish[pid]
-              ncount[cid] += 1
-            nyear += paperYear[pid]
+    key = self.cache.key(pickleFile, [self.dataDir + csvFile], {}, ['paper.dat', 'paperauthor'])
+    if refresh is 0 and self.defer(pickleFile, key, ['unknown']):
+      print ' # Use %s instead of parsing %s' % (pickleFile, csvFile)
+      return
+
+    self.unknown = collections.defaultdict(list)
+
+    def parse(chunk):
+      aids, unknown = chunk
+      return zip(aids.tolist(), unknown.unique().tolists())
+
+    header = ['AuthorId','PaperId','PaperYear','PublishCount','PaperTitle','Publish','mark']
+    for aid, unknown in self.writeFeatures('testAuthor', self.dataDir + csvFile, [(0, csvio.INT), (1, csvio.IDS)],
+                                           parse, outFile, header, FEATURE_IDS, workers):
+      self.unknown[aid].extend(unknown)
+
+    self.cache.save(pickleFile, key, self.unknown)
+
+
+  def trainAuthor(self, aid, confirmed, deleted):
+    """
+    Return feature rows of author's confirmed/deleted papers and
+      (confirmed, deleted, mean of confirmed paperYear, # confirmed papers per conference/journal)
+    """
+    rows  = []
+    count = collections.defaultdict(int)
+
+    publicationInfo = self.getPublicationsProfile(aid)
+    authorSimilarities = self.coauthorSimilarities(aid, confirmed + deleted)
+
+    paperSimilarities = self.similarity.compareMany(map(self.getPaperInfo, confirmed), publicationInfo, confirmed)
+    years = self.paperYear.gather(confirmed, 0).tolist()
+
+    # for testing
+    venues = self.paperPublish.gather(confirmed, -1)
+    for cid in venues[venues >= 0].tolist():
+      count[cid] += 1
+    year = sum(years)
+
+    for pid, yearNorm, authorSimilarity, paperSimilarity in \
+        zip(confirmed, years, authorSimilarities[:len(confirmed)], paperSimilarities):
+      # for training
+      rows.append([aid, pid, yearNorm] + authorSimilarity + paperSimilarity + [1,])
+
+    if len(confirmed) > 0:
+      year /= float(len(confirmed))
+
+    paperSimilarities = self.similarity.compareMany(map(self.getPaperInfo, deleted), publicationInfo, deleted)
+    years = self.paperYear.gather(deleted, 0).tolist()
+
+    for pid, yearNorm, authorSimilarity, paperSimilarity in \
+        zip(deleted, years, authorSimilarities[len(confirmed):], paperSimilarities):
+      rows.append([aid, pid, yearNorm] + authorSimilarity + paperSimilarity + [-1,])
+
+    return rows, (confirmed, deleted, year, count)
+
+
+  def testAuthor(self, aid, unknown):
+    """
+    Return feature rows of author's unknown papers and unknown
+    """
+    rows = []
+
+    publicationInfo = self.getPublicationsProfile(aid)
+    authorSimilarities = self.coauthorSimilarities(aid, unknown)
+
+    paperSimilarities = self.similarity.compareMany(map(self.getPaperInfo, unknown), publicationInfo, unknown)
+    years = self.paperYear.gather(unknown, 0).tolist()
+
+    for pid, yearNorm, authorSimilarity, paperSimilarity in zip(unknown, years, authorSimilarities, paperSimilarities):
+      rows.append([aid, pid, yearNorm] + authorSimilarity + paperSimilarity + [0,])
+
+    return rows, unknown
+
+
+  def outputPaths(self, outFile):
+    """
+    Return (csv path, npy directory) of outFile, None if not written
+    """
+    base, ext = os.path.splitext(outFile)
+    csvPath = self.resultDir + outFile + '.' + self.currentTime
+    if self.compress is not None:
+      csvPath += '.' + self.compress
+    npyPath = self.resultDir + base + '.npy.' + self.currentTime
+    return (csvPath if self.output in ('csv', 'both') else None,
+            npyPath if self.output in ('npy', 'both') else None)
+
+
+  def writeFeatures(self, method, path, columns, parse, outFile, header, intColumns, workers=1, batchSize=32,
+                    skipShort=False):
+    """
+    Write rows of self.<method>(*author) for each author of parse(chunk) of the
+    typed columns of csv path to outFile and return [(authorId, state)] in input order.
+    skipShort skips csv rows missing a column.
+    A reader thread parses batches of authors, rows are computed in this
+    process or, with workers > 1, in forked processes sharing this Data, and
+    a writer thread writes them in order, same bytes as workers=1
+    """
+    csvPath, npyPath = self.outputPaths(outFile)
+    self.prepareSimilarity()
+
+    # Load tables once here, forked workers share them
+    for name in ('paperTitle', 'paperYear', 'paperPublish', 'publishName', 'graph'):
+      getattr(self, name)
+    self.graph.venues()
+
+    # No codec threads are alive when pipeline.run forks workers
+    writer = FeatureOutput(csvPath, npyPath, header, intColumns,
+                           threads=1 if workers > 1 else compression.THREADS)
+    states = []
+    written = [0]
+
+    def write(result):
+      rows, batchStates, counters = result
+      writer.writerows(rows)
+      written[0] += len(rows)
+      states.extend(batchStates)
+      if workers > 1:
+        # Counters of forked workers are not seen by this process
+        metrics.addCounters(collections.OrderedDict(counters))
+
+    global _shared
+    _shared = self
+    try:
+      chunks = csvio.readColumns(path, columns, batchSize, skipShort=skipShort)
+      batches = ((method, parse(chunk)) for chunk in chunks)
+      pipeline.run(batches, featureBatch, write, workers)
+    finally:
+      _shared = None
+
+    writer.close()
+    metrics.addRows(written[0])
+    return states
+
+
+  @stage('testfull', 'paper', 'paperauthor', 'train')
+  @metrics.timed
+  def readTestFull(self, csvFile='Test.csv', pickleFile='testfull.dat', outFile='preprocess_testfull.csv', mode='exact'):
+    # npy pads authors with less than 5 known neighbors
+    header = ['AuthorId']
+    for i in range(1, 6):
+      header += ['KnownAuthorId%d' % i, 'Similarity%d' % i]
+    csvPath, npyPath = self.outputPaths(outFile)
+    writer = FeatureOutput(csvPath, npyPath, header, header[:1] + header[1::2], \
+                           ['AuthorId','PaperId','KnonwAuthorId','Similarity'])
+
+    learned = sorted(self.confirmed)
+    index = NeighborIndex(learned, self.authorAffiliation, self.trainYear, self.trainCount, mode)
+
+    def findNearest(chunk):
+      rows = []
+      aids, unknown = chunk
+      unknown = unknown.unique()
+      for i, aid in enumerate(aids.tolist()):
+        pids = unknown[i]
+
+        # unknown
+        naff = self.authorAffiliation.get(aid, '')
+        nyear = sum(self.paperYear.gather(pids, 0).tolist())
+        ncount = collections.defaultdict(int)
+        venues = self.paperPublish.gather(pids, -1)
+        for cid in venues[venues >= 0].tolist():
+          ncount[cid] += 1
+        if len(pids) > 0:
           nyear /= float(len(pids))
 
-          # learned
-          for caid in learned:
-            caff = self.authorAffiliation[caid]
-            yearDistance = math.sqrt((trainYear[caid] - nyear) ** 2)
-            countDistance = 0
-            for cid in ncount:
-              if cid in trainCount[caid]:
-                countDistance += (ncount[cid] - trainCount[caid][cid]) ** 2
-              else:
-                countDistance += ncount[cid] ** 2
-            for cid in trainCount[caid]:
-              if cid not in ncount:
-                countDistance += trainCount[caid][cid] ** 2
-            countDistance = math.sqrt(countDistance)
-
-            neighbority[caid]   = 0.33 * stringDistance(naff, caff)
-            neighborYear[caid]  = yearDistance
-            neighborCount[caid] = countDistance
-
-          # Find 5 nearest neighbors
-          max_year  = max(neighborYear.iteritems(),  key=operator.itemgetter(1))[1]
-          max_count = max(neighborCount.iteritems(), key=operator.itemgetter(1))[1]
-          for caid in neighborYear:
-            neighbority[caid] += 0.33 * neighborYear[caid] / max_year + 0.33 * neighborCount[caid] / max_count
-
-          nearestList = []
-          for i in range(5):
-            try:
-              nearest = max(neighbority.iteritems(), key=operator.itemgetter(1))
-              nearestList.extend([nearest[0], nearest[1]])
-              neighbority.pop(nearest[0])
-            except ValueError:
-              break
-
-          writer.writerow([aid,] + nearestList)
+        # Find 5 nearest neighbors
+        nearestList = []
+        for nearest in index.query(naff, nyear, ncount, 5):
+          nearestList.extend([nearest[0], nearest[1]])
+
+        rows.append([aid,] + nearestList)
+      return rows
+
+    # Test.csv is parsed and rows are written on their own threads
+    written = [0]
+    def write(rows):
+      writer.writerows(rows)
+      written[0] += len(rows)
+
+    pipeline.run(csvio.readColumns(self.dataDir + csvFile, [(0, csvio.INT), (1, csvio.IDS)], 256),
+                 findNearest, write)
+    writer.close()
+    metrics.addRows(written[0])
+
+
+  def parsePaper(self, chunk):
+    """
+    Return [paperIds, years, conferenceIds, journalIds, raw titles or None] of PAPER_COLUMNS
+    """
+    pids, titles, years, cids, jids = chunk
+    return [pids, years, cids, jids, [title if len(title) > 0 else None for title in titles]]
+
+
+  def normalizeYears(self, years):
+    """
+    Remove error: clip years to [minYear, maxYear] and scale to [0, 1]
+    """
+    years = np.asarray(years, dtype=np.int64)
+    return np.clip((years - self.minYear) / float(self.maxYear - self.minYear), 0, 1)
+
+
+  def mergeVenues(self, cids, jids):
+    """
+    Merge conference and journal: conferenceId, else journalId + journalPad, else -1
+    """
+    cids = np.asarray(cids, dtype=np.int64)
+    jids = np.asarray(jids, dtype=np.int64)
+    return np.where(cids > 0, cids, np.where(jids > 0, jids + self.journalPad, -1))
+
+
+  def parsePaperAuthor(self, chunk):
+    """
+    Return [paperIds, authorIds, raw affiliations or None] of PAPER_AUTHOR_COLUMNS
+    """
+    pids, aids, affs = chunk
+    return [pids, aids, [aff if len(aff) > 0 else None for aff in affs]]
+
+
+  def mergeAffiliations(self, fields):
+    """
+    Keep the longest affiliation of each author from parsePaperAuthor fields
+    """
+    affiliations = self.tokenizer.normalizeMany(fields[2])
+    for aid, aff in zip(fields[1].tolist(), affiliations):
+      if aff is None:
+        continue
+      if aid not in self.authorAffiliation:
+        self.authorAffiliation[aid] = aff
+      elif len(self.authorAffiliation[aid]) > len(aff):
+        pass
+      else:
+        self.authorAffiliation[aid] = aff
+
+
+  @metrics.timed
+  def applyDelta(self, paperCsv=None, paperAuthorCsv=None):
+    """
+    Apply rows appended to Paper.csv / PaperAuthor.csv, given as csv files
+    with the same columns, to the loaded tables without parsing everything again.
+    Return sorted [(authorId, paperId)] of Train/Test rows whose features changed
+    """
+    changedPapers = set()  # papers of the Paper delta, new or parsed again
+    if paperCsv is not None:
+      columns = ArraySink(4, tmpDir=self.pickleDir)
+      stream.run(paperCsv, self.dataDir + paperCsv, PAPER_COLUMNS, self.parsePaper,
+                 [columns, DictSink(self.paperTitle, 0, 4, self.tokenizer.normalizeMany)], self.memoryMB)
+      pids, years, cids, jids = columns.columns()
+
+      # New ids count too: PaperAuthor.csv may already link authors to them
+      changedPapers = set(pids.tolist())
+      self.paperYear.update(pids, self.normalizeYears(years))
+      self.paperPublish.update(pids, self.mergeVenues(cids, jids))
+
+    linkedPapers, linkedAuthors = set(), set()
+    if paperAuthorCsv is not None:
+      links = ArraySink(2, tmpDir=self.pickleDir)
+      stream.run(paperAuthorCsv, self.dataDir + paperAuthorCsv, PAPER_AUTHOR_COLUMNS, self.parsePaperAuthor,
+                 [links, FunctionSink(self.mergeAffiliations)], self.memoryMB)
+      pids, aids = links.columns()
+      linkedPapers, linkedAuthors = self.graph.addLinks(pids.tolist(), aids.tolist())
+
+    # Authors whose publications or venue counts changed
+    affected = set(linkedAuthors)
+    for pid in changedPapers:
+      affected.update(self.graph.coAuthors(pid))
+    self.graph.recount(affected, self.paperPublish)
+
+    for aid in affected:
+      self.profileCache.pop(aid)
+    if len(changedPapers) > 0 and self.similarity.memo is not None:
+      self.similarity.memo.clear()
+
+    # Rows of affected authors, or of papers with a changed co-author or content
+    papers = changedPapers | linkedPapers
+    for aid in affected:
+      papers.update(self.graph.publications(aid))
+
+    # Train/Test tables of stages not run are skipped, not read by running them
+    rows = set()
+    for name in ('confirmed', 'deleted', 'unknown'):
+      if name not in self.__dict__ and name not in self.deferred:
+        continue
+      for aid, pids in getattr(self, name).iteritems():
+        for pid in pids:
+          if aid in affected or pid in papers:
+            rows.add((aid, pid))
+
+    print ' # %d papers, %d authors changed, %d feature rows to regenerate' % \
+          (len(changedPapers | linkedPapers), len(affected), len(rows))
+    return sorted(rows)
+
+
+  def require(self, *stages):
+    """
+    Run stages not run yet, after their dependencies, with default arguments
+    """
+    for name in stages:
+      if name in self.done:
+        continue
+      if name in self.running:
+        raise RuntimeError('Stage %s depends on itself' % name)
+
+      print '[*] Stage %s' % name
+      getattr(self, stageGraph[name][0])()
+
+
+  def defer(self, artifact, key, tables):
+    """
+    Load tables from cached artifact on first access. Return False if not cached
+    """
+    if not self.cache.has(artifact, key):
+      return False
+
+    for name in tables:
+      self.__dict__.pop(name, None)
+      self.deferred[name] = (artifact, key, tables)
+    return True
+
+
+  def loadDeferred(self, name):
+    artifact, key, tables = self.deferred[name]
+    values = self.cache.load(artifact, key)
+    print ' # Load %s' % artifact
+
+    for table, value in zip(tables, values):
+      if self.deferred.get(table, (None,))[0] == artifact:
+        del self.deferred[table]
+        setattr(self, table, value)
+
+
+  def intern(self, table, idmap=None):
+    """
+    Return StringTable of a dict-like table of strings
+    """
+    return StringTable.fromItems(table.iteritems(), '', idmap)
 
 
   def getAuthorInfo(self, aid):
     """
     Return co-author information. Called by getCoAuthorInfo
     """
-    return (self.authorPublishCount[aid],)
+    return (self.graph.publishCount(aid),)
 
 
   def getCoAuthorsInfo(self, author, paper):
@@ -609,13 +808,33 @@ class Data:
     """
     coauthorsInfo = []
 
-    for coauthor in self.paperCoAuthors[paper]:
+    for coauthor in self.graph.coAuthors(paper):
       if author != coauthor:
         coauthorsInfo.append(self.getAuthorInfo(coauthor))
 
     return coauthorsInfo
     
 
+  def coauthorSimilarities(self, aid, pids):
+    """
+    Return coauthorCmp(getAuthorInfo(aid), getCoAuthorsInfo(aid, pid)) of each paper.
+    Distances to all co-authors of the papers come from one sparse product
+    """
+    coauthors = [[coauthor for coauthor in self.graph.coAuthors(pid) if coauthor != aid] for pid in pids]
+    unique = sorted(set(coauthor for authors in coauthors for coauthor in authors))
+    position = dict((coauthor, i) for i, coauthor in enumerate(unique))
+    distances = self.graph.venueDistances(aid, unique).tolist()
+
+    similarities = []
+    for authors in coauthors:
+      if len(authors) > 0:
+        # Same order of additions as coauthorCmp
+        similarities.append([sum([distances[position[coauthor]] for coauthor in authors], 0.0) / len(authors)])
+      else:
+        similarities.append([0.0])
+    return similarities
+
+
   def getPaperInfo(self, pid):
     """
     Return author's publication information. Called by getPublicationsInfo
@@ -636,13 +855,49 @@ class Data:
     """
     publicationInfo = []
 
-    if author in self.authorPublications:
-      for publication in self.authorPublications[author]:
-        publicationInfo.append(self.getPaperInfo(publication))
+    for publication in self.graph.publications(author):
+      publicationInfo.append(self.getPaperInfo(publication))
 
     return publicationInfo
 
 
+  def prepareSimilarity(self):
+    """
+    Fit self.similarity to titles and conference/journal names once
+    """
+    if not self.similarityReady:
+      self.similarity.fit(self.paperTitle.uniqueCounts(), self.publishName.uniqueCounts())
+      self.similarityReady = True
+
+
+  def getPublicationsProfile(self, author):
+    """
+    Return author's publications information prepared for self.similarity
+    """
+    profile = self.profileCache.get(author)
+    if profile is not None:
+      return profile
+
+    self.prepareSimilarity()
+    profile = self.similarity.profile(self.getPublicationsInfo(author), self.graph.publications(author))
+    self.profileCache.put(author, profile)
+    return profile
+
+
+  def counters(self):
+    """
+    Return counters of cache and similarity lookups of this process
+    """
+    return collections.OrderedDict([
+      ('cache.hits', self.cache.hits),
+      ('cache.misses', self.cache.misses),
+      ('similarity.evaluations', self.similarity.evaluations),
+      ('similarity.memo.hits', self.similarity.memo.hits),
+      ('similarity.memo.misses', self.similarity.memo.misses),
+      ('profile.hits', self.profileCache.hits),
+      ('profile.misses', self.profileCache.misses)])
+
+
   def TrainTestClear(self):
     self.confirmed  = collections.defaultdict(list)
     self.deleted    = collections.defaultdict(list)
@@ -651,29 +906,58 @@ class Data:
     self.unknown    = collections.defaultdict(list)
 # --- class Data
 
+for name, table in Data.__dict__.items():
+  if isinstance(table, LazyTable):
+    table.name = name
 
-def main():
-  data = Data(os.getcwd())
-
-  # Parse given data
-  print '[*] Start to read Author.csv'
-  data.readAuthor()
 
-  print '[*] Start to read Conference.csv'
-  data.readConference()
-  
-  print '[*] Start to read Journal.csv'
-  data.readJournal()
-
-  print '[*] Start to read Paper.csv'
-  data.readPaper()
-
-  print '[*] Start to read PaperAuthor.csv'
-  data.readPaperAuthor()
-
-  # Preprocessing
-  print '[*] Start to read Train.csv'
-  data.readTrain()
+def main():
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--similarity', choices=SimilarityEngine.modes, default='exact',
+                      help='title/venue similarity of paper vs. publications')
+  parser.add_argument('--cache-mb', type=int, default=512,
+                      help='memory cap of author profile and paper similarity caches')
+  parser.add_argument('--workers', type=int, default=1,
+                      help='processes for Train.csv/Test.csv feature extraction')
+  parser.add_argument('--neighbors', choices=NeighborIndex.modes, default='exact',
+                      help='nearest learned author search of Test.csv authors')
+  parser.add_argument('--memory-mb', type=int, default=None,
+                      help='spill parsed tables to disk above this resident memory')
+  parser.add_argument('--output', choices=['npy', 'csv', 'both'], default='npy',
+                      help='features as memory-mappable npy directory and/or csv file')
+  parser.add_argument('--compress', choices=['gz', 'bz2', 'xz'], default=None,
+                      help='compress csv features. original_data/*.csv may be read from .gz/.bz2/.xz files')
+  parser.add_argument('--reader', choices=sorted(csvio.readers), default=csvio.default,
+                      help='csv parser, pandas (vectorized, if installed) or the csv module')
+  parser.add_argument('--stages', default='train,testfull',
+                      help='comma separated of train, test, testfull. Tables are loaded on first use')
+  parser.add_argument('--metrics', default=None,
+                      help='json report of stage timings and counters, preprocess/metrics.json.<time> by default')
+  parser.add_argument('--profile', default=None, metavar='STAGE',
+                      help='run STAGE (e.g. paper, train, PaperAuthor.csv) under cProfile, '
+                           'statistics written next to the report. Feature workers are not profiled')
+  args = parser.parse_args()
+
+  stages = args.stages.split(',')
+  for name in stages:
+    if name not in ('train', 'test', 'testfull'):
+      parser.error('unknown stage: %s' % name)
+  csvio.setDefault(args.reader)
+
+  data = Data(os.getcwd(), args.similarity, args.cache_mb, args.memory_mb, args.output, args.compress)
+  report = args.metrics or data.resultDir + 'metrics.json.' + data.currentTime
+  if args.profile is not None:
+    profiled = stageGraph[args.profile][0] if args.profile in stageGraph else args.profile
+    metrics.default.profile(profiled, report + '.prof')
+
+  # Preprocessing, given data is parsed by the stages needing it
+  if 'train' in stages:
+    print '[*] Start to read Train.csv'
+    data.readTrain('Train.csv', 'train.dat', 'preprocess.csv', 0, args.workers)
+
+  if 'test' in stages:
+    print '[*] Start to read Test.csv'
+    data.readTest('Test.csv', 'test.dat', 'preprocess_test.csv', 1, args.workers)
 
   #print '[*] Start to read Valid.csv'
   #data.readTestFull('Valid.csv','valid.dat','preprocess_valid.csv')
@@ -683,8 +967,14 @@ def main():
   #print '[*] Start to read Train+Valid.csv'
   #data.readTrain('Train+Valid.csv','train_valid.dat','preprocess_train+valid.csv')
 
-  print '[*] Start to read Test.csv'
-  data.readTestFull()
+  if 'testfull' in stages:
+    print '[*] Start to read Test.csv'
+    data.readTestFull('Test.csv', 'testfull.dat', 'preprocess_testfull.csv', args.neighbors)
+
+  metrics.addCounters(data.counters())
+  metrics.default.printSummary()
+  metrics.default.save(report)
+  print '[*] Metrics in %s' % report
 
 if __name__ == "__main__":
   main()
@@ -0,0 +1,151 @@
+import csv, os, struct
+import numpy as np
+
+import compression
+
+HEADER_SIZE = 128  # bytes of .npy header, fixed so row count is rewritten in place
+
+
+def npyHeader(dtype, shape):
+  """
+  Return .npy version 1.0 header padded to HEADER_SIZE
+  """
+  d = "{'descr': %r, 'fortran_order': False, 'shape': %r, }" % (np.dtype(dtype).str, tuple(shape))
+  d = d.ljust(HEADER_SIZE - 11) + '\n'
+  return '\x93NUMPY\x01\x00' + struct.pack('<H', len(d)) + d
+
+
+class FeatureWriter:
+  """
+  Feature rows -> directory of .npy files readable with np.load(mmap_mode='r')
+    <IntColumn>.npy : int64 [rows] per id/label column
+    features.npy    : float32 [rows, # other columns]
+    columns.csv     : header, int column names
+  Rows shorter than header are padded with -1 / NaN
+  """
+  def __init__(self, path, header, intColumns, chunkRows=65536):
+    self.path = path
+    self.header = list(header)
+    self.intColumns = [c for c in header if c in intColumns]
+    self.floatColumns = [c for c in header if c not in intColumns]
+    self.intIndex = [self.header.index(c) for c in self.intColumns]
+    self.floatIndex = [self.header.index(c) for c in self.floatColumns]
+    self.padding = [-1 if c in intColumns else np.nan for c in header]
+    self.chunkRows = chunkRows
+    self.buffer = []
+    self.rows = 0
+
+    if not os.path.exists(path):
+      os.makedirs(path)
+
+    with open(os.path.join(path, 'columns.csv'), 'wb') as f:
+      writer = csv.writer(f, delimiter=',')
+      writer.writerow(self.header)
+      writer.writerow(self.intColumns)
+
+    self.files = {}
+    for name in self.intColumns + ['features']:
+      self.files[name] = open(os.path.join(path, name + '.npy'), 'wb')
+      self.files[name].write(npyHeader(*self.shape(name)))
+
+
+  def shape(self, name):
+    if name == 'features':
+      return np.float32, (self.rows, len(self.floatColumns))
+    return np.int64, (self.rows,)
+
+
+  def writerow(self, row):
+    self.writerows([row])
+
+
+  def writerows(self, rows):
+    width = len(self.header)
+    for row in rows:
+      if len(row) < width:
+        row = list(row) + self.padding[len(row):]
+      self.buffer.append(row)
+
+    if len(self.buffer) >= self.chunkRows:
+      self.flush()
+
+
+  def flush(self):
+    if len(self.buffer) == 0:
+      return
+
+    # float64 holds ids below 2**53 exactly
+    block = np.array(self.buffer, dtype=np.float64).reshape(len(self.buffer), len(self.header))
+    for name, i in zip(self.intColumns, self.intIndex):
+      self.files[name].write(block[:, i].astype(np.int64).tostring())
+    self.files['features'].write(block[:, self.floatIndex].astype(np.float32).tostring())
+
+    self.rows += len(self.buffer)
+    self.buffer = []
+
+
+  def close(self):
+    """
+    Flush rows and rewrite headers with the row count
+    """
+    self.flush()
+    for name, f in self.files.iteritems():
+      f.seek(0)
+      f.write(npyHeader(*self.shape(name)))
+      f.close()
+    self.files = {}
+
+
+def loadFeatures(path, mmapMode='r'):
+  """
+  Return (header, {int column: array}, float column names, float32 features)
+  of a FeatureWriter directory
+  """
+  with open(os.path.join(path, 'columns.csv'), 'rb') as f:
+    reader = csv.reader(f)
+    header = reader.next()
+    intColumns = next(reader, [])
+
+  columns = {}
+  for name in intColumns:
+    columns[name] = np.load(os.path.join(path, name + '.npy'), mmap_mode=mmapMode)
+  features = np.load(os.path.join(path, 'features.npy'), mmap_mode=mmapMode)
+
+  return header, columns, [c for c in header if c not in intColumns], features
+
+
+class FeatureOutput:
+  """
+  Feature rows -> csv file and/or FeatureWriter directory, either path may be None.
+  The csv file is compressed by its extension with threads, see compression.openFile
+  """
+  def __init__(self, csvPath, npyPath, header, intColumns, csvHeader=None, threads=compression.THREADS):
+    self.csvFile = None
+    self.csvWriter = None
+    self.npyWriter = None
+
+    if csvPath is not None:
+      self.csvFile = compression.openFile(csvPath, 'wb', threads=threads)
+      self.csvWriter = csv.writer(self.csvFile, delimiter=',')
+      self.csvWriter.writerow(csvHeader or header)
+
+    if npyPath is not None:
+      self.npyWriter = FeatureWriter(npyPath, header, intColumns)
+
+
+  def writerow(self, row):
+    self.writerows([row])
+
+
+  def writerows(self, rows):
+    if self.csvWriter is not None:
+      self.csvWriter.writerows(rows)
+    if self.npyWriter is not None:
+      self.npyWriter.writerows(rows)
+
+
+  def close(self):
+    if self.csvFile is not None:
+      self.csvFile.close()
+    if self.npyWriter is not None:
+      self.npyWriter.close()
@@ -0,0 +1,283 @@
+import os, collections
+import numpy as np
+import scipy.sparse as sp
+
+from idmap import IdMap
+
+
+def csr(keys, values):
+  """
+  Return (unique keys, offsets, values) of (key, value) pairs sorted by key
+  """
+  ids, starts = np.unique(keys, return_index=True)
+  offsets = np.append(starts, len(keys)).astype(np.int64)
+  return ids.astype(np.int64), offsets, np.asarray(values, dtype=np.int64)
+
+
+def normalizeRows(values, offsets):
+  """
+  Min-max normalize each CSR row of values. Equal values are all set to 1
+  """
+  values = np.asarray(values, dtype=np.float64)
+  nonEmpty = np.flatnonzero(np.diff(offsets) > 0)
+  if len(nonEmpty) == 0:
+    return values
+
+  starts = offsets[nonEmpty]
+  lengths = np.diff(offsets)[nonEmpty]
+  maxCount = np.repeat(np.maximum.reduceat(values, starts), lengths)
+  minCount = np.repeat(np.minimum.reduceat(values, starts), lengths)
+
+  span = maxCount - minCount
+  return np.where(span > 0, (values - minCount) / np.where(span > 0, span, 1), 1.0)
+
+
+def takeRows(matrix, rows):
+  """
+  Return csr_matrix of rows of a csr_matrix, cheaper than matrix[rows] for a few rows
+  """
+  starts = matrix.indptr[rows]
+  lengths = matrix.indptr[rows + 1] - starts
+  offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+  np.cumsum(lengths, out=offsets[1:])
+  take = np.arange(offsets[-1]) - np.repeat(offsets[:-1] - starts, lengths)
+  return sp.csr_matrix((matrix.data[take], matrix.indices[take], offsets), shape=(len(rows), matrix.shape[1]))
+
+
+class GraphStore:
+  """
+  Paper <-> author graph in CSR form
+    paperIds[i]  : paperOffsets[i:i+2] -> paperAuthors
+    authorIds[i] : authorOffsets[i:i+2] -> authorPapers
+    authorIds[i] : venueOffsets[i:i+2] -> venueIds, venueCounts (normalized)
+  """
+  arrays = ['paperIds', 'paperOffsets', 'paperAuthors',
+            'authorIds', 'authorOffsets', 'authorPapers',
+            'venueOffsets', 'venueIds', 'venueCounts']
+
+  def __init__(self, **arrays):
+    for name in self.arrays:
+      setattr(self, name, arrays[name])
+    self.papers  = IdMap(self.paperIds)   # paperId -> row of paperOffsets
+    self.authors = IdMap(self.authorIds)  # authorId -> row of authorOffsets, venueOffsets
+
+    # Rows changed by addLinks/recount, read before the arrays
+    self.paperOverlay  = {}  # paperId -> authorIds
+    self.authorOverlay = {}  # authorId -> paperIds
+    self.venueOverlay  = {}  # authorId -> conferenceId/journalId -> normalized # papers
+    self.venueRows = None  # (author x venue csr_matrix with an empty last row, squared row norms)
+
+
+  @classmethod
+  def fromPairs(cls, pids, aids, paperPublish):
+    """
+    Build from (paperId, authorId) columns, duplicates allowed, and
+    paperId -> conferenceId/journalId IdArray. Venue counts are min-max normalized per author
+    """
+    pids = np.asarray(pids, dtype=np.int64)
+    aids = np.asarray(aids, dtype=np.int64)
+
+    # Unique links, ordered by paper then by author
+    order = np.lexsort((aids, pids))
+    pids, aids = pids[order], aids[order]
+    keep = np.ones(len(pids), dtype=bool)
+    keep[1:] = (pids[1:] != pids[:-1]) | (aids[1:] != aids[:-1])
+    pids, aids = pids[keep], aids[keep]
+
+    paperIds, paperOffsets, paperAuthors = csr(pids, aids)
+
+    order = np.lexsort((pids, aids))
+    authorIds, authorOffsets, authorPapers = csr(aids[order], pids[order])
+
+    # Count the number of papers published to conference / journal
+    venues = paperPublish.gather(paperIds, -1).astype(np.int64)
+    linkVenues = np.repeat(venues, np.diff(paperOffsets))[order]
+    linkAuthors = aids[order]
+    published = linkVenues >= 0
+    linkVenues, linkAuthors = linkVenues[published], linkAuthors[published]
+
+    order = np.lexsort((linkVenues, linkAuthors))
+    linkVenues, linkAuthors = linkVenues[order], linkAuthors[order]
+    first = np.ones(len(linkVenues), dtype=bool)
+    first[1:] = (linkVenues[1:] != linkVenues[:-1]) | (linkAuthors[1:] != linkAuthors[:-1])
+    starts = np.flatnonzero(first)
+    venueIds = linkVenues[starts]
+    venueAuthors = linkAuthors[starts]
+    venueCounts = np.diff(np.append(starts, len(linkVenues))).astype(np.float64)
+
+    # Normalize per author
+    rows = np.searchsorted(authorIds, venueAuthors)
+    venueOffsets = np.zeros(len(authorIds) + 1, dtype=np.int64)
+    venueOffsets[1:] = np.cumsum(np.bincount(rows, minlength=len(authorIds)))
+    venueCounts = normalizeRows(venueCounts, venueOffsets)
+
+    return cls(paperIds=paperIds, paperOffsets=paperOffsets, paperAuthors=paperAuthors,
+               authorIds=authorIds, authorOffsets=authorOffsets, authorPapers=authorPapers,
+               venueOffsets=venueOffsets, venueIds=venueIds, venueCounts=venueCounts)
+
+
+  @staticmethod
+  def exists(storeDir):
+    return all(os.path.isfile(os.path.join(storeDir, name + '.npy')) for name in GraphStore.arrays)
+
+
+  def save(self, storeDir):
+    if not os.path.exists(storeDir):
+      os.makedirs(storeDir)
+
+    for name in self.arrays:
+      np.save(os.path.join(storeDir, name + '.npy'), getattr(self, name))
+
+
+  @classmethod
+  def load(cls, storeDir, mmapMode='r'):
+    """
+    Open saved arrays. With mmapMode='r' pages are shared between processes
+    """
+    arrays = {}
+    for name in cls.arrays:
+      arrays[name] = np.load(os.path.join(storeDir, name + '.npy'), mmap_mode=mmapMode)
+
+    return cls(**arrays)
+
+
+  def coAuthors(self, pid):
+    """
+    Return authorIds of paper
+    """
+    if pid in self.paperOverlay:
+      return list(self.paperOverlay[pid])
+
+    i = self.papers.index(pid)
+    if i < 0:
+      return []
+    return self.paperAuthors[self.paperOffsets[i]:self.paperOffsets[i + 1]].tolist()
+
+
+  def publications(self, aid):
+    """
+    Return paperIds of author
+    """
+    if aid in self.authorOverlay:
+      return list(self.authorOverlay[aid])
+
+    i = self.authors.index(aid)
+    if i < 0:
+      return []
+    return self.authorPapers[self.authorOffsets[i]:self.authorOffsets[i + 1]].tolist()
+
+
+  def publishCount(self, aid):
+    """
+    Return conferenceId/journalId -> normalized # papers of author
+    """
+    if aid in self.venueOverlay:
+      return dict(self.venueOverlay[aid])
+
+    i = self.authors.index(aid)
+    if i < 0:
+      return {}
+    start, end = self.venueOffsets[i], self.venueOffsets[i + 1]
+    return dict(zip(self.venueIds[start:end].tolist(), self.venueCounts[start:end].tolist()))
+
+
+  def venues(self):
+    """
+    Return (csr_matrix of normalized # papers, authors x conferenceId/journalId,
+    with an empty last row, squared norm of each row), built once
+    """
+    if self.venueRows is None:
+      width = int(self.venueIds.max()) + 1 if len(self.venueIds) > 0 else 1
+      offsets = np.append(self.venueOffsets, self.venueOffsets[-1])
+      matrix = sp.csr_matrix((np.asarray(self.venueCounts), np.asarray(self.venueIds), offsets),
+                             shape=(len(self.authorIds) + 1, width))
+      self.venueRows = (matrix, np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    return self.venueRows
+
+
+  def venueMatrix(self, aids):
+    """
+    Return (csr_matrix of publishCount() of each author, squared norm of each row)
+    """
+    matrix, norms = self.venues()
+    rows = self.authors.indices(aids)
+    rows[rows < 0] = matrix.shape[0] - 1
+
+    overlay = [(i, aid) for i, aid in enumerate(aids) if aid in self.venueOverlay]
+    if len(overlay) == 0:
+      return takeRows(matrix, rows), norms[rows]
+
+    # Rows of recounted authors are appended below the arrays
+    extra = [self.venueOverlay[aid] for i, aid in overlay]
+    cols = [cid for counts in extra for cid in counts]
+    width = max([matrix.shape[1]] + [cid + 1 for cid in cols])
+    offsets = np.cumsum([0] + [len(counts) for counts in extra])
+    added = sp.csr_matrix((np.array([counts[cid] for counts in extra for cid in counts], dtype=np.float64),
+                           np.array(cols, dtype=np.int64), offsets), shape=(len(extra), width))
+
+    matrix = sp.vstack([sp.csr_matrix((matrix.data, matrix.indices, matrix.indptr),
+                                      shape=(matrix.shape[0], width)), added], format='csr')
+    norms = np.append(norms, np.asarray(added.multiply(added).sum(axis=1)).ravel())
+    for j, (i, aid) in enumerate(overlay):
+      rows[i] = matrix.shape[0] - len(extra) + j
+    return takeRows(matrix, rows), norms[rows]
+
+
+  def venueDistances(self, aid, aids):
+    """
+    Return euclidean distance between publishCount() of aid and of each of aids,
+    sqrt(|a|^2 + |b|^2 - 2 a.b) from one sparse product
+    """
+    matrix, norms = self.venueMatrix([aid] + list(aids))
+    cols = matrix.indices[matrix.indptr[0]:matrix.indptr[1]]
+    author = np.zeros(matrix.shape[1])
+    author[cols] = matrix.data[matrix.indptr[0]:matrix.indptr[1]]
+
+    squared = norms[0] + norms[1:] - 2 * matrix.dot(author)[1:]
+
+    # Cancellation near 0, sum the squared differences instead
+    for i in np.flatnonzero(squared <= 1e-9 * (norms[0] + norms[1:])).tolist():
+      start, end = matrix.indptr[i + 1], matrix.indptr[i + 2]
+      other = matrix.indices[start:end]
+      squared[i] = ((matrix.data[start:end] - author[other]) ** 2).sum() + \
+                   (author[np.setdiff1d(cols, other)] ** 2).sum()
+
+    return np.sqrt(np.maximum(squared, 0))
+
+
+  def addLinks(self, pids, aids):
+    """
+    Add (paperId, authorId) links. Return (paperIds, authorIds) with new links
+    """
+    papers, authors = set(), set()
+
+    for pid, aid in zip(pids, aids):
+      coauthors = self.paperOverlay.get(pid)
+      if coauthors is None:
+        coauthors = self.paperOverlay[pid] = self.coAuthors(pid)
+      if aid in coauthors:
+        continue
+
+      coauthors.append(aid)
+      coauthors.sort()
+      if aid not in self.authorOverlay:
+        self.authorOverlay[aid] = self.publications(aid)
+      self.authorOverlay[aid].append(pid)
+      self.authorOverlay[aid].sort()
+
+      papers.add(pid)
+      authors.add(aid)
+
+    return papers, authors
+
+
+  def recount(self, aids, paperPublish):
+    """
+    Count and normalize # papers per conference/journal of authors again
+    """
+    for aid in aids:
+      venues = paperPublish.gather(self.publications(aid), -1)
+      cids, counts = np.unique(venues[venues >= 0], return_counts=True)
+
+      counts = normalizeRows(counts, np.array([0, len(cids)]))
+      self.venueOverlay[aid] = dict(zip(cids.tolist(), counts.tolist()))
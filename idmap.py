@@ -0,0 +1,225 @@
+import numpy as np
+
+
+class IdMap:
+  """
+  Sparse integer ids <-> dense indices 0 .. len - 1
+    ids[i] : sorted ids assigned at ingestion, found by searchsorted
+    extra  : ids added afterwards, indexed from len(ids) on in order of add()
+  """
+  def __init__(self, ids, extra=()):
+    self.ids = ids
+    self.extra = {}  # id -> index
+    self.extraIds = []
+    for key in extra:
+      self.add(key)
+
+
+  @staticmethod
+  def fromIds(ids):
+    """
+    Return IdMap of ids, duplicates allowed
+    """
+    return IdMap(np.unique(np.asarray(ids, dtype=np.int64)))
+
+
+  def __len__(self):
+    return len(self.ids) + len(self.extraIds)
+
+
+  def __contains__(self, key):
+    return self.index(key) >= 0
+
+
+  def index(self, key):
+    """
+    Return dense index of key, -1 if missing
+    """
+    i = int(np.searchsorted(self.ids, key))
+    if i < len(self.ids) and self.ids[i] == key:
+      return i
+    return self.extra.get(key, -1)
+
+
+  def indices(self, keys):
+    """
+    Return dense index of each key as an array, -1 if missing
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    if len(self.ids) == 0:
+      found = np.full(keys.shape, -1, dtype=np.int64)
+    else:
+      found = np.minimum(np.searchsorted(self.ids, keys), len(self.ids) - 1)
+      found = np.where(self.ids[found] == keys, found, -1)
+
+    if len(self.extra) > 0:
+      for j in np.flatnonzero(found < 0).tolist():
+        found[j] = self.extra.get(int(keys[j]), -1)
+    return found
+
+
+  def add(self, key):
+    """
+    Return dense index of key, assigning the next index if missing
+    """
+    i = self.index(key)
+    if i < 0:
+      i = self.extra[key] = len(self)
+      self.extraIds.append(key)
+    return i
+
+
+  def keys(self):
+    """
+    Return ids in order of dense index
+    """
+    if len(self.extraIds) == 0:
+      return self.ids
+    return np.append(self.ids, np.array(self.extraIds, dtype=np.int64))
+
+
+  def save(self, path):
+    np.save(path + '.ids.npy', self.ids)
+    np.save(path + '.extra.npy', np.array(self.extraIds, dtype=np.int64))
+
+
+  @staticmethod
+  def load(path, mmapMode='r'):
+    return IdMap(np.load(path + '.ids.npy', mmap_mode=mmapMode),
+                 np.load(path + '.extra.npy').tolist())
+
+
+class IdArray:
+  """
+  Values of ids in a flat array indexed by an IdMap, missing value where absent.
+  Dict-like for single ids, gather() for arrays of ids
+  """
+  def __init__(self, idmap, values, missing, default=None):
+    self.idmap = idmap
+    self.values = values
+    self.missing = missing
+    self.default = default
+
+
+  @staticmethod
+  def fromItems(items, dtype, missing, default=None, idmap=None):
+    """
+    Return IdArray of (id, value) items, indexed by idmap or by a new IdMap of their ids
+    """
+    items = list(items)
+    keys = np.array([key for key, value in items], dtype=np.int64)
+    if idmap is None:
+      idmap = IdMap.fromIds(keys)
+
+    found = idmap.indices(keys)
+    if (found < 0).any():
+      raise ValueError('%d ids missing in idmap' % (found < 0).sum())
+
+    values = np.empty(len(idmap), dtype=dtype)
+    values.fill(missing)
+    values[found] = [value for key, value in items]
+    return IdArray(idmap, values, missing, default)
+
+
+  @staticmethod
+  def fromColumns(keys, values, missing, default=None, idmap=None):
+    """
+    Return IdArray of keys and values columns, the last value of a duplicate key kept
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    if idmap is None:
+      idmap = IdMap.fromIds(keys)
+
+    unique, last = np.unique(keys[::-1], return_index=True)
+    last = len(keys) - 1 - last
+    found = idmap.indices(unique)
+    if (found < 0).any():
+      raise ValueError('%d ids missing in idmap' % (found < 0).sum())
+
+    array = np.empty(len(idmap), dtype=np.asarray(values).dtype)
+    array.fill(missing)
+    array[found] = np.asarray(values)[last]
+    return IdArray(idmap, array, missing, default)
+
+
+  def _present(self, value):
+    return value == value and value != self.missing  # NaN never present
+
+
+  def get(self, key, default=None):
+    i = self.idmap.index(key)
+    if i < 0 or i >= len(self.values) or not self._present(self.values[i]):
+      return default
+    return self.values[i].item()
+
+
+  def __getitem__(self, key):
+    return self.get(key, self.default)
+
+
+  def __contains__(self, key):
+    i = self.idmap.index(key)
+    return 0 <= i < len(self.values) and self._present(self.values[i])
+
+
+  def _grow(self, size):
+    if size > len(self.values):
+      grown = np.empty(max(size, 2 * len(self.values)), dtype=self.values.dtype)
+      grown.fill(self.missing)
+      grown[:len(self.values)] = self.values
+      self.values = grown
+
+
+  def __setitem__(self, key, value):
+    i = self.idmap.add(key)
+    self._grow(i + 1)
+    self.values[i] = value
+
+
+  def update(self, keys, values):
+    """
+    Set values of keys columns, ids missing in idmap are added
+    """
+    keys = np.asarray(keys, dtype=np.int64)
+    rows = self.idmap.indices(keys)
+    for j in np.flatnonzero(rows < 0).tolist():
+      rows[j] = self.idmap.add(int(keys[j]))
+
+    self._grow(len(self.idmap))
+    self.values[rows] = values
+
+
+  def __len__(self):
+    values = self.values
+    present = values == values
+    if self.missing == self.missing:
+      present &= values != self.missing
+    return int(present.sum())
+
+
+  def gather(self, keys, default):
+    """
+    Return values of keys as an array, default where missing
+    """
+    rows = self.idmap.indices(keys)
+    inside = (rows >= 0) & (rows < len(self.values))
+    values = np.empty(len(rows), dtype=self.values.dtype)
+    values.fill(default)
+    values[inside] = self.values[rows[inside]]
+
+    missing = ~inside
+    missing[inside] = ~((values[inside] == values[inside]) & (values[inside] != self.missing))
+    values[missing] = default
+    return values
+
+
+  def iteritems(self):
+    keys = self.idmap.keys()
+    for i, value in enumerate(self.values[:len(keys)].tolist()):
+      if self._present(value):
+        yield int(keys[i]), value
+
+
+  def itervalues(self):
+    for key, value in self.iteritems():
+      yield value
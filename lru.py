@@ -0,0 +1,60 @@
+import collections
+
+
+class LRUCache:
+  """
+  Least recently used cache bounded by an estimated size in bytes
+    weigh(key, value) -> estimated bytes of an entry
+  """
+  def __init__(self, maxBytes, weigh=None):
+    self.maxBytes = maxBytes
+    self.weigh = weigh if weigh is not None else (lambda key, value: 160)
+    self.entries = collections.OrderedDict()  # key -> (value, bytes)
+    self.size = 0
+    self.hits = 0
+    self.misses = 0
+
+
+  def __contains__(self, key):
+    return key in self.entries
+
+
+  def __len__(self):
+    return len(self.entries)
+
+
+  def get(self, key, default=None):
+    entry = self.entries.pop(key, None)
+    if entry is None:
+      self.misses += 1
+      return default
+
+    self.hits += 1
+    self.entries[key] = entry  # most recently used
+    return entry[0]
+
+
+  def put(self, key, value):
+    if key in self.entries:
+      self.size -= self.entries.pop(key)[1]
+
+    weight = self.weigh(key, value)
+    if weight > self.maxBytes:
+      return
+
+    self.entries[key] = (value, weight)
+    self.size += weight
+
+    while self.size > self.maxBytes:
+      self.size -= self.entries.popitem(last=False)[1][1]
+
+
+  def pop(self, key):
+    entry = self.entries.pop(key, None)
+    if entry is not None:
+      self.size -= entry[1]
+
+
+  def clear(self):
+    self.entries.clear()
+    self.size = 0
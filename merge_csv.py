@@ -1,37 +1,134 @@
-import csv, os, sys
+import argparse, heapq, shutil, time
 
-title = 0
+import metrics, compression
 
-def mergeCsv(dest, target):
-  global title
+blockSize = 16 << 20  # bytes per copy
 
-  with open(dest, 'ab') as csvFile:
-    writer = csv.writer(csvFile)
-    
-    with open(target, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
 
-      if title > 0:
-        reader.next()
-      else:
-        title += 1
+def readHeader(f):
+  """
+  Return column names line without line ending
+  """
+  return f.readline().rstrip('\r\n')
 
-      for row in reader:
-        writer.writerow(row)
+
+def checkHeader(header, expected, target):
+  if expected is not None and header != expected:
+    raise ValueError('%s has columns %s, expected %s' % (target, header, expected))
+  return header
+
+
+class CountingWriter:
+  """
+  Writes to f, counting bytes and keeping the last byte written
+  """
+  def __init__(self, f):
+    self.f = f
+    self.bytes = 0
+    self.last = None
+
+
+  def write(self, data):
+    if len(data) > 0:
+      self.f.write(data)
+      self.bytes += len(data)
+      self.last = data[-1]
+
+
+def concatCsv(dest, targets):
+  """
+  Append targets to dest as raw bytes by shutil.copyfileobj, column names
+  written once. .gz / .bz2 / .xz targets are decompressed, dest is compressed
+  by its extension. Return # bytes written
+  """
+  header = None
+  for target in targets:
+    with compression.openFile(target) as csvFile:
+      header = checkHeader(readHeader(csvFile), header, target)
+
+  with compression.openFile(dest, 'ab', blockSize) as csvOut:
+    out = CountingWriter(csvOut)
+    for i, target in enumerate(targets):
+      with compression.openFile(target, 'rb', blockSize) as csvFile:
+        line = csvFile.readline()
+        if i == 0:
+          out.write(line)
+
+        out.last = None  # last byte of the rows
+        shutil.copyfileobj(csvFile, out, blockSize)
+
+        # Keep rows of next target on their own line
+        if out.last is not None and out.last != '\n':
+          out.write('\r\n')
+
+  return out.bytes
+
+
+def readSorted(target):
+  """
+  Yield ((AuthorId, PaperId), line) of a csv sorted by AuthorId, PaperId
+  """
+  with compression.openFile(target) as csvFile:
+    csvFile.readline()  # pass column name
+
+    last = None
+    for line in csvFile:
+      if not line.endswith('\n'):
+        line += '\r\n'
+      fields = line.split(',', 2)
+      key = (int(fields[0]), int(fields[1]))
+      if last is not None and key < last:
+        raise ValueError('%s is not sorted by AuthorId, PaperId at %s' % (target, key))
+      last = key
+      yield key, line
+
+
+def sortedMergeCsv(dest, targets):
+  """
+  k-way merge of targets sorted by AuthorId, PaperId into dest.
+  Return # bytes written
+  """
+  header = None
+  for target in targets:
+    with compression.openFile(target) as csvFile:
+      header = checkHeader(readHeader(csvFile), header, target)
+
+  written = 0
+  with compression.openFile(dest, 'wb', blockSize) as csvOut:
+    csvOut.write(header + '\r\n')
+    written += len(header) + 2
+
+    for key, line in heapq.merge(*[readSorted(target) for target in targets]):
+      csvOut.write(line)
+      written += len(line)
+
+  return written
 
 
 def main():
-  argc = len(sys.argv)
+  parser = argparse.ArgumentParser(usage='%(prog)s [-h] [--sorted] csv1 csv2 [...] merged')
+  parser.add_argument('--sorted', action='store_true',
+                      help='k-way merge of csv files sorted by AuthorId, PaperId')
+  parser.add_argument('files', nargs='*')
+  args = parser.parse_args()
 
-  if argc is 2:
+  if len(args.files) < 2:
     print 'Usage: csv1 csv2 merged'
     return
 
-  mergedCsv = sys.argv[argc - 1]
+  mergedCsv = args.files[-1]
+  targets = args.files[:-1]
 
-  for i in range(1, argc - 1):
-    mergeCsv(mergedCsv, sys.argv[i])
+  start = time.time()
+  with metrics.timer('sortedMergeCsv' if args.sorted else 'concatCsv'):
+    if args.sorted:
+      written = sortedMergeCsv(mergedCsv, targets)
+    else:
+      written = concatCsv(mergedCsv, targets)
+  elapsed = max(time.time() - start, 1e-9)
 
+  print ' # %d files, %d MB, %0.1f MB/s' % (len(targets), written >> 20, written / elapsed / 2 ** 20)
+  metrics.default.printSummary()  # with codec throughput of compressed files
   print '[*] Done'
 
 if __name__ == "__main__":
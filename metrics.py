@@ -0,0 +1,235 @@
+import collections, contextlib, datetime, functools
+import json, os, resource, sys, time
+import cProfile, pstats
+
+
+def currentRSS():
+  """
+  Return resident set size in bytes
+  """
+  try:
+    with open('/proc/self/statm') as f:
+      return int(f.read().split()[1]) * resource.getpagesize()
+  except IOError:
+    return peakRSS()
+
+
+def peakRSS():
+  """
+  Return peak resident set size in bytes
+  """
+  return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class Metrics:
+  """
+  Instrumentation of one run
+    stages   : name -> {'calls', 'seconds', 'rows', 'peakRSS' [, 'io']}, in order of first start.
+               Stages nest, rows are counted by the innermost running stage.
+               io : codec -> {'files', 'bytes', 'rawBytes', 'seconds'} of compressed files
+    counters : name -> count, e.g. cache hits, similarity evaluations
+  One stage may be run under cProfile, see profile()
+  """
+  def __init__(self):
+    self.reset()
+
+
+  def reset(self):
+    """
+    Forget stages, counters and profiler, e.g. between benchmark runs
+    """
+    self.started = time.time()
+    self.stages = collections.OrderedDict()
+    self.counters = collections.OrderedDict()
+    self.active = []  # records of running stages, innermost last
+    self.profileStage = None
+    self.profilePath = None
+    self.profiler = None
+    self.profiling = False
+
+
+  def stage(self, name):
+    record = self.stages.get(name)
+    if record is None:
+      record = self.stages[name] = collections.OrderedDict([('calls', 0), ('seconds', 0.0), ('rows', 0), ('peakRSS', 0)])
+    return record
+
+
+  def record(self, name, seconds, rows=0):
+    """
+    Add a stage timed elsewhere, e.g. in a worker process
+    """
+    record = self.stage(name)
+    record['calls'] += 1
+    record['seconds'] += seconds
+    record['rows'] += rows
+
+
+  @contextlib.contextmanager
+  def timer(self, name):
+    """
+    Time the with block as stage name, yield its record
+    """
+    record = self.stage(name)
+    profiling = name == self.profileStage and not self.profiling
+    if profiling:
+      self.profiling = True
+      self.profiler.enable()
+
+    self.active.append(record)
+    start = time.time()
+    try:
+      yield record
+    finally:
+      record['seconds'] += time.time() - start
+      record['calls'] += 1
+      record['peakRSS'] = peakRSS()
+      self.active.pop()
+      if profiling:
+        self.profiler.disable()
+        self.profiling = False
+
+
+  def timed(self, function):
+    """
+    Decorator timing each call of function as a stage of its name.
+    An integer return value is counted as rows
+    """
+    @functools.wraps(function)
+    def wrap(*args, **kw):
+      start = time.time()
+      with self.timer(function.func_name) as record:
+        r = function(*args, **kw)
+        if isinstance(r, (int, long)) and not isinstance(r, bool):
+          record['rows'] += r
+      print "%s (%0.3f ms)" % (function.func_name, (time.time() - start) * 1000)
+      return r
+    return wrap
+
+
+  def current(self):
+    """
+    Return record of the innermost running stage, None if none runs
+    """
+    return self.active[-1] if len(self.active) > 0 else None
+
+
+  def addIO(self, record, codec, size, rawSize, seconds):
+    """
+    Count a compressed file of size bytes, rawSize uncompressed, and seconds
+    spent in its codec to stage record, e.g. current() when it was opened
+    """
+    if record is None:
+      return
+    io = record.setdefault('io', collections.OrderedDict())
+    entry = io.get(codec)
+    if entry is None:
+      entry = io[codec] = collections.OrderedDict([('files', 0), ('bytes', 0), ('rawBytes', 0), ('seconds', 0.0)])
+    entry['files'] += 1
+    entry['bytes'] += size
+    entry['rawBytes'] += rawSize
+    entry['seconds'] += seconds
+
+
+  def addRows(self, rows):
+    """
+    Count rows processed by the innermost running stage
+    """
+    if len(self.active) > 0:
+      self.active[-1]['rows'] += rows
+
+
+  def count(self, name, n=1):
+    self.counters[name] = self.counters.get(name, 0) + n
+
+
+  def addCounters(self, counters):
+    for name, n in counters.iteritems():
+      self.count(name, n)
+
+
+  def profile(self, stage, path):
+    """
+    Run stage under cProfile, statistics dumped to path by save()
+    """
+    self.profileStage = stage
+    self.profilePath = path
+    self.profiler = cProfile.Profile()
+
+
+  def profiled(self):
+    """
+    Return True if the profiled stage has run
+    """
+    return self.profiler is not None and self.profileStage in self.stages
+
+
+  def report(self):
+    """
+    Return dict of the run, stages with rows/s
+    """
+    stages = []
+    for name, record in self.stages.iteritems():
+      stage = collections.OrderedDict([('name', name)])
+      stage.update(record)
+      stage['rowsPerSecond'] = record['rows'] / max(record['seconds'], 1e-9)
+      if 'io' in record:
+        stage['io'] = collections.OrderedDict()
+      for codec, entry in record.get('io', {}).iteritems():
+        stage['io'][codec] = collections.OrderedDict(entry)
+        stage['io'][codec]['ratio'] = entry['rawBytes'] / float(max(entry['bytes'], 1))
+        stage['io'][codec]['rawBytesPerSecond'] = entry['rawBytes'] / max(entry['seconds'], 1e-9)
+      stages.append(stage)
+
+    return collections.OrderedDict([
+      ('command', sys.argv),
+      ('started', datetime.datetime.fromtimestamp(self.started).isoformat()),
+      ('seconds', time.time() - self.started),
+      ('peakRSS', peakRSS()),
+      ('stages', stages),
+      ('counters', self.counters),
+      ('profile', self.profilePath if self.profiled() else None)])
+
+
+  def save(self, path):
+    """
+    Write report() as json to path, and cProfile statistics if profiled
+    """
+    directory = os.path.dirname(path)
+    if directory != '' and not os.path.exists(directory):
+      os.makedirs(directory)
+    with open(path, 'wb') as f:
+      json.dump(self.report(), f, indent=2)
+
+    if self.profiled():
+      self.profiler.dump_stats(self.profilePath)
+
+
+  def printSummary(self, profileLines=20):
+    print '[*] Timing'
+    for name, record in self.stages.iteritems():
+      print ' # %-22s %9.3f s %10d rows %12.0f rows/s %7d MB' % \
+            (name, record['seconds'], record['rows'], record['rows'] / max(record['seconds'], 1e-9),
+             record['peakRSS'] / 2 ** 20)
+      for codec, entry in record.get('io', {}).iteritems():
+        print ' #   %-20s %9.3f s %7.1f MB -> %7.1f MB x%0.1f %8.1f MB/s' % \
+              (codec, entry['seconds'], entry['bytes'] / 2.0 ** 20, entry['rawBytes'] / 2.0 ** 20,
+               entry['rawBytes'] / float(max(entry['bytes'], 1)), entry['rawBytes'] / max(entry['seconds'], 1e-9) / 2 ** 20)
+    for name, n in self.counters.iteritems():
+      print ' # %-22s %9d' % (name, n)
+
+    if self.profiler is not None and not self.profiled():
+      print '[*] Stage %s to profile did not run' % self.profileStage
+    elif self.profiler is not None:
+      print '[*] Profile of %s' % self.profileStage
+      pstats.Stats(self.profiler).sort_stats('cumulative').print_stats(profileLines)
+
+
+default = Metrics()  # shared by the modules of a run
+
+timer = default.timer
+timed = default.timed
+addRows = default.addRows
+count = default.count
+addCounters = default.addCounters
+record = default.record
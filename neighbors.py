@@ -0,0 +1,160 @@
+import collections
+
+import numpy as np
+import scipy.sparse as sp
+
+from similarity import NgramVectorizer, unicodeDistance
+
+
+class NeighborIndex:
+  """
+  Learned authors indexed by affiliation, mean paper year and # papers per
+  conference/journal. query() scores every learned author as readTestFull does
+    0.33 * affiliation + 0.33 * year distance / max + 0.33 * count distance / max
+  and returns the k highest.
+    exact  : stringDistance of affiliations against all learned authors
+    approx : cosine of affiliation n-grams, only learned authors sharing a
+             random-projection LSH bucket with the query are scored
+  """
+  modes = ('exact', 'approx')
+
+  def __init__(self, authors, affiliations, years, counts, mode='exact', tables=8, bits=12, seed=13):
+    if mode not in self.modes:
+      raise ValueError('Unknown neighbor mode: %s' % mode)
+
+    self.mode = mode
+    self.authors = np.array(authors, dtype=np.int64)
+    self.years = np.array([years[aid] for aid in authors], dtype=np.float64)
+
+    # Sparse # papers per conference/journal
+    self.columns = {}
+    rows, cols, values = [], [], []
+    for i, aid in enumerate(authors):
+      for cid, count in counts[aid].iteritems():
+        rows.append(i)
+        cols.append(self.columns.setdefault(cid, len(self.columns)))
+        values.append(count)
+    self.counts = sp.csr_matrix((np.array(values, dtype=np.float64), (rows, cols)),
+                                shape=(len(authors), max(1, len(self.columns))))
+    self.countNorms = np.asarray(self.counts.multiply(self.counts).sum(axis=1), dtype=np.float64).ravel()
+    self.maxCountNorm = np.sqrt(self.countNorms.max()) if len(authors) > 0 else 0
+
+    # Affiliations, deduplicated
+    affiliations = [affiliations.get(aid, '') for aid in authors]
+    self.affiliations = sorted(set(a for a in affiliations if len(a) > 0))
+    position = dict((a, i) for i, a in enumerate(self.affiliations))
+    self.affiliationIndex = np.array([position.get(a, -1) for a in affiliations], dtype=np.int64)
+
+    if mode == 'exact':
+      self.unicodeAffiliations = [a.decode('utf-8') for a in self.affiliations]
+    else:
+      self.vectorizer = NgramVectorizer(dims=2 ** 14).fit(self.affiliations)
+      self.affiliationVectors = self.vectorizer.transform(self.affiliations)
+
+      rand = np.random.RandomState(seed)
+      self.planes = rand.randn(self.vectorizer.dims, tables * bits).astype(np.float32)
+      self.tables = tables
+      self.bits = bits
+      self.buckets = [collections.defaultdict(list) for t in range(0, tables)]
+
+      codes = self._codes(self.affiliationVectors)
+      for i, k in enumerate(self.affiliationIndex):
+        if k >= 0:
+          for t in range(0, tables):
+            self.buckets[t][codes[k, t]].append(i)
+
+
+  def _codes(self, vectors):
+    """
+    Return LSH bucket of each vector for each table
+    """
+    signs = np.asarray(vectors.dot(self.planes)) > 0
+    weights = 1 << np.arange(self.bits)
+    return signs.reshape(vectors.shape[0], self.tables, self.bits).dot(weights)
+
+
+  def _candidates(self, affiliation, k):
+    """
+    Return indices of learned authors to score
+    """
+    if self.mode == 'exact' or len(affiliation) == 0:
+      return np.arange(len(self.authors))
+
+    codes = self._codes(self.vectorizer.transform([affiliation]))[0]
+    candidates = set()
+    for t in range(0, self.tables):
+      candidates.update(self.buckets[t].get(codes[t], ()))
+
+    if len(candidates) < k:
+      return np.arange(len(self.authors))
+    return np.array(sorted(candidates), dtype=np.int64)
+
+
+  def _affiliationScores(self, affiliation, candidates):
+    scores = np.zeros(len(candidates), dtype=np.float64)
+    if len(affiliation) == 0 or len(self.affiliations) == 0:
+      return scores
+
+    index = self.affiliationIndex[candidates]
+    unique = np.unique(index[index >= 0])
+
+    if self.mode == 'exact':
+      string = affiliation.decode('utf-8')
+      distance = dict((k, unicodeDistance(string, self.unicodeAffiliations[k])) for k in unique.tolist())
+      for i, k in enumerate(index.tolist()):
+        if k >= 0:
+          scores[i] = distance[k]
+    else:
+      query = self.vectorizer.transform([affiliation])
+      distance = np.zeros(len(self.affiliations), dtype=np.float64)
+      distance[unique] = self.affiliationVectors[unique].dot(query.T).toarray().ravel()
+      scores[index >= 0] = distance[index[index >= 0]]
+
+    return scores
+
+
+  def query(self, affiliation, year, counts, k=5):
+    """
+    Return [(learned authorId, similarity)] of k highest similarity
+    """
+    if len(self.authors) == 0:
+      return []
+
+    candidates = self._candidates(affiliation, k)
+
+    # Euclidean distance of counts: |n|^2 + |c|^2 - 2 n.c
+    vector = np.zeros(self.counts.shape[1], dtype=np.float64)
+    norm = 0.0
+    for cid, count in counts.iteritems():
+      norm += count ** 2
+      if cid in self.columns:
+        vector[self.columns[cid]] = count
+    if len(candidates) < len(self.authors):
+      dot = self.counts[candidates].dot(vector)
+    else:
+      dot = self.counts.dot(vector)
+    countDistance = np.sqrt(np.maximum(norm + self.countNorms[candidates] - 2 * dot, 0))
+    yearDistance = np.sqrt((self.years[candidates] - year) ** 2)
+
+    # Normalize by farthest learned author (approx: by upper bounds)
+    if self.mode == 'exact':
+      maxYear, maxCount = yearDistance.max(), countDistance.max()
+    else:
+      maxYear = max(abs(self.years.max() - year), abs(year - self.years.min()))
+      maxCount = np.sqrt(norm) + self.maxCountNorm
+
+    similarity = 0.33 * self._affiliationScores(affiliation, candidates)
+    yearTerm = 0.33 * yearDistance / maxYear if maxYear > 0 else np.zeros(len(candidates))
+    countTerm = 0.33 * countDistance / maxCount if maxCount > 0 else np.zeros(len(candidates))
+    similarity += yearTerm + countTerm
+
+    # Top k, ties broken by authorId
+    if len(candidates) > k:
+      top = np.argpartition(-similarity, k - 1)[:k]
+      threshold = similarity[top].min()
+      top = np.flatnonzero(similarity >= threshold)
+    else:
+      top = np.arange(len(candidates))
+    top = top[np.lexsort((self.authors[candidates[top]], -similarity[top]))][:k]
+
+    return [(int(self.authors[candidates[i]]), float(similarity[i])) for i in top]
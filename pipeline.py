@@ -0,0 +1,98 @@
+import sys, threading, Queue
+import collections, multiprocessing
+
+_end = object()  # end of batches on a queue
+
+
+class _Failure:
+  """
+  Exception of a reader or writer thread, raised again by run()
+  """
+  def __init__(self):
+    self.excInfo = sys.exc_info()
+
+
+def _read(source, queue):
+  try:
+    for batch in source:
+      queue.put(batch)
+  except Exception:
+    queue.put(_Failure())
+    return
+  queue.put(_end)
+
+
+def _write(sink, queue, failures):
+  # Keep draining after a failure so producers never block on a full queue
+  while True:
+    result = queue.get()
+    if result is _end:
+      return
+    if len(failures) == 0:
+      try:
+        sink(result)
+      except Exception:
+        failures.append(_Failure())
+
+
+def run(source, compute, sink, workers=1, depth=4):
+  """
+  Overlap reading, computing and writing of batches
+    source : iterable of batches, iterated on a reader thread
+    compute(batch) -> result, in a pool of workers processes (forked, so
+      compute must be a module-level function) or in this thread if workers <= 1
+    sink(result) on a writer thread, called in the order of source
+  At most depth batches wait between reader and compute, depth per worker are
+  in the pool and depth results wait for the writer, bounding memory.
+  Return # batches
+  """
+  # Fork workers before starting threads, children never copy a queue lock held by one
+  pool = multiprocessing.Pool(workers) if workers > 1 else None
+
+  inQueue = Queue.Queue(depth)
+  outQueue = Queue.Queue(depth)
+  failures = []
+
+  reader = threading.Thread(target=_read, args=(source, inQueue))
+  writer = threading.Thread(target=_write, args=(sink, outQueue, failures))
+  reader.daemon = writer.daemon = True
+  reader.start()
+  writer.start()
+
+  pending = collections.deque()  # AsyncResults in order of batches
+  count = 0
+  try:
+    while len(failures) == 0:
+      batch = inQueue.get()
+      if batch is _end:
+        break
+      if isinstance(batch, _Failure):
+        failures.append(batch)
+        break
+
+      count += 1
+      if pool is None:
+        outQueue.put(compute(batch))
+        continue
+
+      pending.append(pool.apply_async(compute, (batch,)))
+      if len(pending) >= workers * depth:
+        outQueue.put(pending.popleft().get())
+
+    while len(pending) > 0:
+      outQueue.put(pending.popleft().get())
+  except:
+    if pool is not None:
+      pool.terminate()
+      pool = None
+    raise
+  finally:
+    if pool is not None:
+      pool.close()
+      pool.join()
+    outQueue.put(_end)
+    writer.join()
+
+  if len(failures) > 0:
+    raise failures[0].excInfo[0], failures[0].excInfo[1], failures[0].excInfo[2]
+  return count
@@ -0,0 +1,209 @@
+import collections, math
+
+import jellyfish
+import numpy as np
+import scipy.sparse as sp
+
+
+def unicodeDistance(str1, str2):
+  """
+  stringDistance of two non-empty unicode strings
+  """
+  jaro = jellyfish.jaro_distance(str1, str2)
+  leven = jellyfish.levenshtein_distance(str1, str2)
+  damerau = jellyfish.damerau_levenshtein_distance(str1, str2)
+
+  norm = max(len(str1), len(str2))
+  return 0.5 * jaro + 0.25 * (1 - leven / norm)   \
+                    + 0.25 * (1 - damerau / norm)
+
+
+def profileBytes(key, profile):
+  """
+  Rough memory estimate of SimilarityEngine.profile() for LRUCache
+  """
+  return 512 + 256 * profile[0]
+
+
+class NgramVectorizer:
+  """
+  Hashed character n-gram TF-IDF vectors, rows are l2 normalized
+  """
+  def __init__(self, n=3, dims=2 ** 18):
+    self.n = n
+    self.dims = dims
+    self.idf = None
+
+
+  def grams(self, string):
+    string = ' %s ' % string
+    mask = self.dims - 1
+    return [hash(string[i:i + self.n]) & mask for i in range(0, len(string) - self.n + 1)]
+
+
+  def fit(self, strings, counts=None):
+    """
+    Learn inverse document frequency of n-grams from strings,
+    each string counted counts[i] times if given
+    """
+    df = np.zeros(self.dims, dtype=np.float64)
+    docs = 0
+    for i, string in enumerate(strings):
+      if len(string) > 0:
+        count = 1 if counts is None else counts[i]
+        df[list(set(self.grams(string)))] += count
+        docs += count
+
+    self.idf = np.log((1.0 + docs) / (1.0 + df)) + 1.0
+    return self
+
+
+  def transform(self, strings):
+    rows, cols = [], []
+    for i, string in enumerate(strings):
+      grams = self.grams(string)
+      rows.extend([i] * len(grams))
+      cols.extend(grams)
+
+    matrix = sp.csr_matrix((np.ones(len(cols)), (rows, cols)), shape=(len(strings), self.dims))
+    matrix.sum_duplicates()
+    if self.idf is not None:
+      matrix.data *= self.idf[matrix.indices]
+
+    norm = np.sqrt(np.bincount(np.repeat(np.arange(len(strings)), np.diff(matrix.indptr)),
+                               weights=matrix.data ** 2, minlength=len(strings)))
+    norm[norm == 0] = 1
+    matrix.data /= np.repeat(norm, np.diff(matrix.indptr))
+    return matrix
+
+
+class SimilarityEngine:
+  """
+  Compare one paper against all publications of an author in one call
+    exact  : same weighted jaro + levenshtein + damerau as stringDistance
+    approx : cosine of character n-gram TF-IDF vectors
+  With memo (LRUCache) and paperIds, exact scores are memoized per (pid, pid)
+  """
+  modes = ('exact', 'approx')
+
+  def __init__(self, mode='exact', memo=None):
+    if mode not in self.modes:
+      raise ValueError('Unknown similarity mode: %s' % mode)
+
+    self.mode = mode
+    self.memo = memo
+    self.vectorizers = None
+    self.evaluations = 0  # # (paper, unique publication string) pairs scored
+
+
+  def fit(self, titles, publishNames):
+    """
+    Learn n-gram weights of titles and conference/journal names (approx only),
+    each given as (unique strings, # occurrences of each)
+    """
+    if self.mode == 'approx':
+      self.vectorizers = (NgramVectorizer().fit(*titles), NgramVectorizer().fit(*publishNames))
+
+
+  def profile(self, publications, pids=None):
+    """
+    Return pre-processed publications information of an author
+      (# publications, [per field: (unique non-empty strings, counts)],
+       pids, [per field: unique string index of each publication or -1])
+    """
+    fields = []
+    index = []
+    for field in range(0, 2):
+      counter = collections.Counter(p[field] for p in publications if len(p[field]) > 0)
+      strings = counter.keys()
+      counts = np.array([counter[s] for s in strings], dtype=np.float64)
+
+      position = dict((s, i) for i, s in enumerate(strings))
+      index.append([position.get(p[field], -1) for p in publications])
+
+      if self.mode == 'exact':
+        fields.append(([s.decode('utf-8') for s in strings], counts))
+      else:
+        vectorizer = self.vectorizers[field] if self.vectorizers else NgramVectorizer()
+        fields.append((vectorizer.transform(strings), counts))
+
+    return (len(publications), fields, pids, index)
+
+
+  def compare(self, paper, profile, pid=None):
+    """
+    Return mean of distance between paper and each publication of profile
+    """
+    return self.compareMany([paper], profile, None if pid is None else [pid])[0]
+
+
+  def compareMany(self, papers, profile, pids=None):
+    """
+    Return compare() of each paper, vectors of all papers are built at once
+    """
+    cnt, fields = profile[0:2]
+    means = [[0.0 for i in range(0, len(fields))] for paper in papers]
+    if cnt == 0 or len(papers) == 0:
+      return means
+
+    if self.mode == 'exact' and self.memo is not None and pids is not None and profile[2] is not None:
+      for i, paper in enumerate(papers):
+        means[i] = self._memoCompare(paper, pids[i], profile)
+      return means
+
+    for field, (strings, counts) in enumerate(fields):
+      if len(counts) == 0:
+        continue
+
+      if self.mode == 'exact':
+        for i, paper in enumerate(papers):
+          if len(paper[field]) > 0:
+            string = paper[field].decode('utf-8')
+            scores = np.array([unicodeDistance(string, s) for s in strings])
+            self.evaluations += len(strings)
+            means[i][field] = float(counts.dot(scores)) / cnt
+      else:
+        vectorizer = self.vectorizers[field] if self.vectorizers else NgramVectorizer()
+        queries = vectorizer.transform([paper[field] for paper in papers])
+        scores = queries.dot(strings.T).dot(counts) / cnt
+        self.evaluations += len(papers) * len(counts)
+        for i, paper in enumerate(papers):
+          if len(paper[field]) > 0:
+            means[i][field] = float(scores[i])
+
+    return means
+
+
+  def _memoCompare(self, paper, pid, profile):
+    """
+    Sum (pid, publication) scores one by one, looking up self.memo first
+    """
+    cnt, fields, pubPids, index = profile
+    strings = [paper[field].decode('utf-8') for field in range(0, len(fields))]
+    scored = [{} for field in fields]  # unique string index -> score
+    memo = self.memo
+    total = [0.0 for field in fields]
+
+    for j, pub in enumerate(pubPids):
+      key = (pid, pub) if pid < pub else (pub, pid)
+      pair = memo.get(key)
+
+      if pair is None:
+        pair = []
+        for field, (unique, counts) in enumerate(fields):
+          k = index[field][j]
+          if k < 0 or len(strings[field]) == 0:
+            pair.append(0)
+          elif k in scored[field]:
+            pair.append(scored[field][k])
+          else:
+            scored[field][k] = unicodeDistance(strings[field], unique[k])
+            self.evaluations += 1
+            pair.append(scored[field][k])
+        pair = tuple(pair)
+        memo.put(key, pair)
+
+      for field in range(0, len(fields)):
+        total[field] += pair[field]
+
+    return [total[field] / cnt for field in range(0, len(fields))]
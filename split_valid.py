@@ -1,5 +1,9 @@
 import csv, os
+import argparse
 import pickle
+import collections
+
+import csvio, compression
 
 class Data:
   def __init__ (self, runDir):
@@ -8,84 +12,65 @@ class Data:
 
     if not os.path.exists(self.dataDir):
       os.makedirs(self.dataDir)
+    if not os.path.exists(self.pickleDir):
+      os.makedirs(self.pickleDir)
 
-    self.confirmed = {}
-    self.deleted   = {}
+    # Ordered sets: OrderedDict of key -> 1
+    self.confirmed = {}  # authorId -> confirmed paperIds
+    self.deleted   = {}  # authorId -> deleted paperIds
     #self.usages    = {}
-    self.aids = []
-
+    self.aids = collections.OrderedDict()  # authorIds in order of appearance
 
-  def readValidSolution(self, csvFile   ='ValidSolution.csv' \
-                            , pickleFile='validsolution_.dat'):
 
+  def readRows(self, csvFile, pickleFile):
+    """
+    Return [(AuthorId, [PaperId])] of csvFile, ids as ints
+    """
     if os.path.isfile(self.pickleDir + pickleFile):
-      with open(self.pickleDir + pickleFile) as f:
-        self.confirmed = pickle.load(f)
-        #self.usages    = pickle.load(f)
+      with open(self.pickleDir + pickleFile, 'rb') as f:
+        rows = pickle.load(f)
 
         print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
-
-    with open(self.dataDir + csvFile, 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()  # pass column name
-
-      for row in reader:
-        aid   = int(row[0])
-        pids  = row[1].split()
-        #usage = row[2]
-
-        if aid not in self.aids:
-          self.aids.append(aid)
-
-        if aid not in self.confirmed:
-          self.confirmed[aid] = []
+        return rows
 
-        for pid in pids:
-          if pid not in self.confirmed[aid]:
-            self.confirmed[aid].append(pid)
+    rows = []
+    for aids, pids in csvio.readColumns(self.dataDir + csvFile, [(0, csvio.INT), (1, csvio.IDS)]):
+      rows.extend(zip(aids.tolist(), pids.tolists()))
 
-        #self.usages[aid] = usage
+    with open(self.pickleDir + pickleFile, 'wb') as f:
+      pickle.dump(rows, f, pickle.HIGHEST_PROTOCOL)
 
-    with open(self.pickleDir + 'validsolution_.dat', 'wb') as f:
-      pickle.dump(self.confirmed, f)
-      #pickle.dump(self.usages, f)
+    return rows
 
 
-  def readValid(self, csvFile='Valid.csv', pickleFile='valid_.dat'):
-
-    if os.path.isfile(self.pickleDir + pickleFile):
-      with open(self.pickleDir + pickleFile) as f:
-        self.deleted = pickle.load(f)
-
-        print ' # Load %s instead of parsing %s' % (pickleFile, csvFile)
-        return
+  def readValidSolution(self, csvFile   ='ValidSolution.csv' \
+                            , pickleFile='validsolution_ids.dat'):
 
-    with open(self.dataDir + 'Valid.csv', 'rb') as csvFile:
-      reader = csv.reader(csvFile)
-      reader.next()
+    for aid, pids in self.readRows(csvFile, pickleFile):
+      self.aids[aid] = 1
 
-      for row in reader:
-        aid  = int(row[0])
-        pids = row[1].split()
+      confirmed = self.confirmed.setdefault(aid, collections.OrderedDict())
+      for pid in pids:
+        confirmed[pid] = 1
 
-        if aid not in self.aids:
-          self.aids.append(aid)
 
-        if aid not in self.deleted:
-          self.deleted[aid] = []
+  def readValid(self, csvFile='Valid.csv', pickleFile='valid_ids.dat'):
 
-        for pid in pids:
-          if aid not in self.confirmed \
-             or pid not in self.confirmed[aid] and pid not in self.deleted[aid]:
-            self.deleted[aid].append(pid)
+    for aid, pids in self.readRows(csvFile, pickleFile):
+      self.aids[aid] = 1
 
-    with open(self.pickleDir + 'valid_.dat', 'wb') as f:
-      pickle.dump(self.deleted, f)
+      deleted = self.deleted.setdefault(aid, collections.OrderedDict())
+      confirmed = self.confirmed.get(aid, ())
+      for pid in pids:
+        if pid not in confirmed:
+          deleted[pid] = 1
 
 
   def writeValidToTrain(self, csvFile='ValidToTrain.csv'):
-    with open(self.dataDir + csvFile, 'wb') as csvOut:
+    """
+    csvFile ending with .gz / .bz2 / .xz is compressed
+    """
+    with compression.openFile(self.dataDir + csvFile, 'wb') as csvOut:
       writer = csv.writer(csvOut, delimiter=',')
       writer.writerow(['AuthorId','ConfirmedPaperIds','DeletedPaperIds'])
 
@@ -93,26 +78,53 @@ class Data:
         if aid not in self.confirmed:
           writeConfirm = []
         else:
-          writeConfirm = [" ".join(self.confirmed[aid])]
+          writeConfirm = [" ".join(map(str, self.confirmed[aid]))]
 
         if aid not in self.deleted:
           writeDelete = []
         else:
-          writeDelete = [" ".join(self.deleted[aid])]
+          writeDelete = [" ".join(map(str, self.deleted[aid]))]
 
         writer.writerow([aid,] + writeConfirm + writeDelete)
 
+def pickleName(csvFile):
+  """
+  Return pickle of csvFile ids, ValidSolution.csv or ValidSolution.csv.gz -> validsolution_ids.dat
+  """
+  if compression.codecOf(csvFile) is not None:
+    csvFile = os.path.splitext(csvFile)[0]
+  return os.path.splitext(csvFile)[0].lower() + '_ids.dat'
+
 def main():
+  """
+  split_valid.py [--output ValidToTrain.csv] [ValidSolution.csv Valid.csv [ValidSolution2.csv Valid2.csv ...]]
+  Files are in test/, .gz / .bz2 / .xz files are read if the csv is missing
+  """
+  parser = argparse.ArgumentParser()
+  parser.add_argument('--output', default='ValidToTrain.csv', help='written compressed if ending with .gz/.bz2/.xz')
+  parser.add_argument('files', nargs='*')
+  args = parser.parse_args()
+
+  argv = args.files or ['ValidSolution.csv', 'Valid.csv']
+  if len(argv) % 2 != 0:
+    print 'Usage: solution1 valid1 [solution2 valid2 ...]'
+    return
+
   data = Data(os.getcwd())
+  pairs = zip(argv[0::2], argv[1::2])
 
-  print '[*] Start to read ValidSolution.csv'
-  data.readValidSolution()
+  # Every solution first, so a paper confirmed in any pair is never deleted.
+  # Pickles of int ids, older '_.dat' pickles of string ids are not read
+  for solution, valid in pairs:
+    print '[*] Start to read %s' % solution
+    data.readValidSolution(solution, pickleName(solution))
 
-  print '[*] Start to read Valid.csv'
-  data.readValid()
+  for solution, valid in pairs:
+    print '[*] Start to read %s' % valid
+    data.readValid(valid, pickleName(valid))
 
-  print '[*] Start to create ValidToTrain.csv'
-  data.writeValidToTrain()
+  print '[*] Start to create %s' % args.output
+  data.writeValidToTrain(args.output)
 
 if __name__ == "__main__":
   main()
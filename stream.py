@@ -0,0 +1,220 @@
+import os
+import shelve, pickle, shutil, tempfile
+
+import numpy as np
+
+import metrics, csvio
+from metrics import currentRSS
+
+
+class SpillDict:
+  """
+  Dict that moves its items to a shelve on disk by spill().
+  Missing keys read as default without being created
+  """
+  def __init__(self, path, default=None):
+    self.path = path
+    self.default = default
+    self.memory = {}
+    self.disk = None
+
+
+  def spill(self):
+    if self.disk is None:
+      self.disk = shelve.open(self.path, 'n', protocol=pickle.HIGHEST_PROTOCOL)
+    for k, v in self.memory.iteritems():
+      self.disk[str(k)] = v
+    self.memory = {}
+
+
+  def __getstate__(self):
+    if self.disk is not None:
+      self.spill()
+      self.disk.sync()
+    return {'path': self.path, 'default': self.default, 'memory': self.memory,
+            'spilled': self.disk is not None}
+
+
+  def __setstate__(self, state):
+    self.path = state['path']
+    self.default = state['default']
+    self.memory = state['memory']
+    self.disk = shelve.open(self.path, 'w', protocol=pickle.HIGHEST_PROTOCOL) \
+                if state['spilled'] else None
+
+
+  def __setitem__(self, key, value):
+    if self.disk is not None and str(key) in self.disk:
+      self.disk[str(key)] = value
+    else:
+      self.memory[key] = value
+
+
+  def __getitem__(self, key):
+    return self.get(key, self.default)
+
+
+  def get(self, key, default=None):
+    if key in self.memory:
+      return self.memory[key]
+    if self.disk is not None:
+      return self.disk.get(str(key), default)
+    return default
+
+
+  def __contains__(self, key):
+    return key in self.memory or (self.disk is not None and str(key) in self.disk)
+
+
+  def __len__(self):
+    return len(self.memory) + (len(self.disk) if self.disk is not None else 0)
+
+
+  def iteritems(self):
+    for item in self.memory.iteritems():
+      yield item
+    if self.disk is not None:
+      for k, v in self.disk.iteritems():
+        yield int(k), v
+
+
+  def itervalues(self):
+    for k, v in self.iteritems():
+      yield v
+
+
+class DictSink:
+  """
+  fields[key] -> fields[value] into dict or SpillDict, None values are skipped.
+  transform(values) maps the value column of each chunk at once
+  """
+  def __init__(self, target, key=0, value=1, transform=None):
+    self.target = target
+    self.key = key
+    self.value = value
+    self.transform = transform
+
+
+  def write(self, fields):
+    target = self.target
+    keys = fields[self.key]
+    values = fields[self.value]
+    if hasattr(keys, 'tolist'):
+      keys = keys.tolist()
+    if self.transform is not None:
+      values = self.transform(values)
+
+    for k, v in zip(keys, values):
+      if v is not None:
+        target[k] = v
+
+
+  def spill(self):
+    if hasattr(self.target, 'spill'):
+      self.target.spill()
+
+
+  def close(self):
+    pass
+
+
+class ArraySink:
+  """
+  First fields integer columns -> numpy columns, chunks spilled to .npy
+  """
+  def __init__(self, fields, dtype=np.int64, tmpDir=None):
+    self.fields = fields
+    self.dtype = dtype
+    self.tmpDir = tmpDir
+    self.chunks = [[] for i in range(0, fields)]
+    self.spillDir = None
+    self.spilled = 0
+
+
+  def write(self, fields):
+    for i in range(0, self.fields):
+      self.chunks[i].append(np.asarray(fields[i], dtype=self.dtype))
+
+
+  def spill(self):
+    if self.spillDir is None:
+      self.spillDir = tempfile.mkdtemp(prefix='spill', dir=self.tmpDir)
+
+    for i in range(0, self.fields):
+      for chunk in self.chunks[i]:
+        np.save(os.path.join(self.spillDir, '%d.%08d.npy' % (i, self.spilled)), chunk)
+        self.spilled += 1
+      self.chunks[i] = []
+
+
+  def close(self):
+    pass
+
+
+  def columns(self):
+    """
+    Return list of numpy columns, spilled chunks are read back in order
+    """
+    columns = []
+    for i in range(0, self.fields):
+      parts = []
+      if self.spillDir is not None:
+        for name in sorted(os.listdir(self.spillDir)):
+          if name.startswith('%d.' % i):
+            parts.append(np.load(os.path.join(self.spillDir, name), mmap_mode='r'))
+      parts.extend(self.chunks[i])
+      columns.append(np.concatenate(parts) if len(parts) > 0 else np.zeros(0, dtype=self.dtype))
+
+    if self.spillDir is not None:
+      shutil.rmtree(self.spillDir)
+      self.spillDir = None
+    return columns
+
+
+class FunctionSink:
+  """
+  fields -> function(fields)
+  """
+  def __init__(self, function):
+    self.function = function
+
+
+  def write(self, fields):
+    self.function(fields)
+
+
+  def spill(self):
+    pass
+
+
+  def close(self):
+    pass
+
+
+def run(name, path, columns, parse, sinks, memoryMB=None, chunkSize=50000):
+  """
+  Stream typed columns [(index, csvio type)] of csv chunks through
+  parse(chunk) -> fields, a list of equal length columns, into each sink.
+  Sinks spill to disk while resident memory exceeds memoryMB.
+  Timed as stage name, print rows/s and peak RSS, return # rows
+  """
+  with metrics.timer(name) as stats:
+    count = 0
+    for chunk in csvio.readColumns(path, columns, chunkSize):
+      fields = parse(chunk)
+      count += len(chunk[0])
+
+      for sink in sinks:
+        sink.write(fields)
+
+      if memoryMB is not None and currentRSS() > memoryMB * 2 ** 20:
+        for sink in sinks:
+          sink.spill()
+
+    for sink in sinks:
+      sink.close()
+    metrics.addRows(count)
+
+  print ' # %s: %d rows, %d rows/s, peak RSS %d MB' % \
+        (name, count, count / max(stats['seconds'], 1e-9), stats['peakRSS'] / 2 ** 20)
+  return count
@@ -0,0 +1,127 @@
+import numpy as np
+
+from idmap import IdMap
+
+
+class StringTable:
+  """
+  Interned strings of integer ids, equal strings stored once
+    idmap   : id -> dense index i, may be shared with other tables of the same ids
+    refs[i] : unique string of dense index i, -1 if missing
+    buffer[offsets[s]:offsets[s+1]] : UTF-8 bytes of unique string s
+  Items set after construction go to overlay, read before the arrays
+  """
+  def __init__(self, idmap, refs, buffer, offsets, default=''):
+    self.idmap = idmap
+    self.refs = refs
+    self.buffer = buffer
+    self.offsets = offsets
+    self.default = default
+    self.overlay = {}  # id -> string set after construction
+
+
+  @staticmethod
+  def fromItems(items, default='', idmap=None):
+    """
+    Return StringTable of unique (id, string) items, indexed by idmap or
+    by a new IdMap of their ids
+    """
+    ids, refs = [], []
+    position = {}  # string -> unique string index
+    strings = []
+    for key, string in items:
+      s = position.get(string)
+      if s is None:
+        s = position[string] = len(strings)
+        strings.append(string)
+      ids.append(key)
+      refs.append(s)
+
+    ids = np.array(ids, dtype=np.int64)
+    if idmap is None:
+      idmap = IdMap.fromIds(ids)
+    rows = np.empty(len(idmap), dtype=np.int32)
+    rows.fill(-1)
+    found = idmap.indices(ids)
+    if (found < 0).any():
+      raise ValueError('%d ids missing in idmap' % (found < 0).sum())
+    rows[found] = refs
+
+    offsets = np.zeros(len(strings) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(string) for string in strings])
+
+    return StringTable(idmap, rows, ''.join(strings), offsets, default)
+
+
+  def ref(self, key):
+    """
+    Return unique string index of key, -1 if missing or set after construction
+    """
+    i = self.idmap.index(key)
+    if i < 0 or i >= len(self.refs):
+      return -1
+    return int(self.refs[i])
+
+
+  def string(self, s):
+    return self.buffer[int(self.offsets[s]):int(self.offsets[s + 1])]
+
+
+  def get(self, key, default=None):
+    if key in self.overlay:
+      return self.overlay[key]
+    s = self.ref(key)
+    if s < 0:
+      return default
+    return self.string(s)
+
+
+  def __getitem__(self, key):
+    return self.get(key, self.default)
+
+
+  def __setitem__(self, key, value):
+    self.overlay[key] = value
+
+
+  def __contains__(self, key):
+    return key in self.overlay or self.ref(key) >= 0
+
+
+  def __len__(self):
+    return int((self.refs >= 0).sum()) + sum(1 for key in self.overlay if self.ref(key) < 0)
+
+
+  def iteritems(self):
+    overlay = self.overlay
+    for key, s in zip(self.idmap.keys().tolist(), self.refs.tolist()):
+      if s >= 0 and key not in overlay:
+        yield key, self.string(s)
+    for item in overlay.iteritems():
+      yield item
+
+
+  def itervalues(self):
+    for key, value in self.iteritems():
+      yield value
+
+
+  def uniqueCounts(self):
+    """
+    Return (strings, # ids of each string), overlay strings counted one by one
+    """
+    counts = np.bincount(self.refs[self.refs >= 0], minlength=len(self.offsets) - 1).astype(np.float64)
+    for key in self.overlay:
+      s = self.ref(key)
+      if s >= 0:
+        counts[s] -= 1
+
+    strings = [self.string(s) for s in range(0, len(counts))] + self.overlay.values()
+    return strings, np.append(counts, np.ones(len(self.overlay)))
+
+
+  def nbytes(self):
+    """
+    Return bytes held by arrays and buffer, overlay and idmap excluded
+    """
+    return self.refs.nbytes + len(self.buffer) + self.offsets.nbytes
@@ -0,0 +1,44 @@
+import os, sys, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from cache import CacheManager
+from stream import SpillDict
+
+
+class CacheTest(unittest.TestCase):
+  def setUp(self):
+    self.cacheDir = tempfile.mkdtemp()
+    self.cache = CacheManager(self.cacheDir, 1)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.cacheDir)
+
+
+  def testSaveKeepsSpillShelve(self):
+    # readAuthor: author.db shelve spilled in the cache directory, then author.dat saved
+    table = SpillDict(os.path.join(self.cacheDir, 'author.db'), '')
+    table[1] = 'university'
+    table.spill()
+    table[2] = 'institute'
+
+    key = self.cache.key('author.dat', params={'run': 1})
+    self.cache.save('author.dat', key, dict(table.iteritems()))
+
+    self.assertEqual(table[1], 'university')
+    self.assertEqual(table[2], 'institute')
+    self.assertEqual(self.cache.load('author.dat', key), [{1: 'university', 2: 'institute'}])
+
+
+  def testSaveExpiresOtherVersions(self):
+    old = self.cache.key('author.dat', params={'run': 1})
+    new = self.cache.key('author.dat', params={'run': 2})
+    self.cache.save('author.dat', old, {})
+    self.cache.save('author.dat', new, {})
+
+    self.assertFalse(os.path.exists(self.cache.path('author.dat', old)))
+    self.assertTrue(self.cache.has('author.dat', new))
+
+
+if __name__ == '__main__':
+  unittest.main()
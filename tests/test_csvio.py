@@ -0,0 +1,47 @@
+import os, sys, unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import csvio
+
+
+class IdListsTest(unittest.TestCase):
+  def testParseIdLists(self):
+    ids = csvio.parseIdLists(['1 2 3', '', '  40\t5 ', '-6', '7'])
+    self.assertEqual(len(ids), 5)
+    self.assertEqual(ids.tolists(), [[1, 2, 3], [], [40, 5], [-6], [7]])
+    self.assertEqual(ids.offsets.tolist(), [0, 3, 3, 5, 6, 7])
+    self.assertEqual(ids[2].tolist(), [40, 5])
+    self.assertEqual(ids.rows().tolist(), [0, 0, 0, 2, 2, 3, 4])
+
+
+  def testParseIdListsEmpty(self):
+    self.assertEqual(csvio.parseIdLists([]).tolists(), [])
+    self.assertEqual(csvio.parseIdLists(['', '']).tolists(), [[], []])
+
+
+  def testParseIdListsInvalid(self):
+    for strings in (['1 2a'], ['1', 'x'], ['1.5']):
+      self.assertRaises(ValueError, csvio.parseIdLists, strings)
+
+
+  def testUnique(self):
+    ids = csvio.parseIdLists(['3 1 3 2', '', '5 5', '9 8 7 8']).unique()
+    self.assertEqual(ids.tolists(), [[1, 2, 3], [], [5], [7, 8, 9]])
+    self.assertEqual(csvio.parseIdLists(['', '']).unique().tolists(), [[], []])
+
+
+  def testSelect(self):
+    ids = csvio.parseIdLists(['1 2 3', '4', '5 6'])
+    self.assertEqual(ids.select(ids.ids % 2 == 1).tolists(), [[1, 3], [], [5]])
+
+
+  def testParseInts(self):
+    self.assertEqual(csvio.parseInts(['1', '-2', '30']).tolist(), [1, -2, 30])
+    self.assertEqual(csvio.parseInts(['1', '-2', '30']).dtype, np.int64)
+    self.assertRaises(ValueError, csvio.parseInts, ['1', '2b'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,45 @@
+import csv, os, sys, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import data_mining
+
+
+class LineChunksTest(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.path = os.path.join(self.tmpDir, 'PaperAuthor.csv')
+
+    # Affiliations with quoted newlines, quotes and commas
+    self.rows = []
+    for i in range(0, 200):
+      affiliation = 'Univ %d' % i
+      if i % 3 == 0:
+        affiliation += '\nline "two", of %d\nthree' % i
+      self.rows.append([str(i), str(i % 17), 'name', affiliation])
+    with open(self.path, 'wb') as f:
+      writer = csv.writer(f)
+      writer.writerow(['PaperId', 'AuthorId', 'Name', 'Affiliation'])
+      writer.writerows(self.rows)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.tmpDir)
+
+
+  def testRangesKeepQuotedRows(self):
+    size = os.path.getsize(self.path)
+    for count in (1, 2, 3, 7, 16, 50):
+      chunks = data_mining.lineChunks(self.path, count)
+      self.assertTrue(len(chunks) <= count)
+      self.assertEqual(chunks[-1][1], size)
+      for (start, end), (nextStart, nextEnd) in zip(chunks[:-1], chunks[1:]):
+        self.assertEqual(end, nextStart)
+
+      rows = []
+      for start, end in chunks:
+        rows.extend(csv.reader(data_mining.readRange(self.path, start, end)))
+      self.assertEqual(rows, self.rows)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,113 @@
+import csv, os, sys, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import feature
+from bench import generate
+
+
+def readCsv(path):
+  with open(path, 'rb') as f:
+    return list(csv.reader(f))
+
+
+def writeCsv(path, rows):
+  with open(path, 'wb') as f:
+    csv.writer(f).writerows(rows)
+
+
+def trainFeatures(data):
+  """
+  Return (authorId, paperId) -> feature row of every Train.csv paper
+  """
+  features = {}
+  for aid in sorted(data.confirmed):
+    rows, state = data.trainAuthor(aid, data.confirmed[aid], data.deleted.get(aid, []))
+    for row in rows:
+      features[(row[0], row[1])] = row
+  return features
+
+
+class ApplyDeltaTest(unittest.TestCase):
+  """
+  Data.applyDelta on a run missing some Paper.csv / PaperAuthor.csv rows vs.
+  a run parsing the full files
+  """
+  def setUp(self):
+    self.runDir = tempfile.mkdtemp()
+    fullDir = os.path.join(self.runDir, 'full', 'original_data')
+    incDir = os.path.join(self.runDir, 'inc', 'original_data')
+    os.makedirs(fullDir)
+    generate.writeDataset(fullDir, 0.02)
+    shutil.copytree(fullDir, incDir)
+
+    paper = readCsv(os.path.join(fullDir, 'Paper.csv'))
+    paperAuthor = readCsv(os.path.join(fullDir, 'PaperAuthor.csv'))
+    header, rows = paper[0], paper[1:]
+    cids = sorted(set(row[3] for row in rows if row[3] != '0'))
+
+    # Every 5th paper is new in the delta though PaperAuthor.csv links to it,
+    # every 7th is sent again with another title and conference
+    base, delta, updated = [], [], {}
+    for i, row in enumerate(rows):
+      if i % 5 == 0:
+        delta.append(row)
+        continue
+      base.append(row)
+      if i % 7 == 0:
+        update = [row[0], row[1] + ' revised', row[2], cids[(cids.index(row[3]) + 1) % len(cids)] \
+                  if row[3] in cids else cids[0], '0', row[5]]
+        delta.append(update)
+        updated[row[0]] = update
+
+    writeCsv(os.path.join(fullDir, 'Paper.csv'), [header] + [updated.get(row[0], row) for row in rows])
+    writeCsv(os.path.join(incDir, 'Paper.csv'), [header] + base)
+    writeCsv(os.path.join(incDir, 'PaperDelta.csv'), [header] + delta)
+
+    # Last links are new in the delta
+    split = len(paperAuthor) - len(paperAuthor) / 10
+    writeCsv(os.path.join(incDir, 'PaperAuthor.csv'), paperAuthor[:split])
+    writeCsv(os.path.join(incDir, 'PaperAuthorDelta.csv'), paperAuthor[:1] + paperAuthor[split:])
+
+    self.newPapers = set(int(row[0]) for row in delta if row[0] not in updated)
+    self.updatedPapers = set(int(pid) for pid in updated)
+
+
+  def tearDown(self):
+    shutil.rmtree(self.runDir)
+
+
+  def testMatchesFullIngest(self):
+    inc = feature.Data(os.path.join(self.runDir, 'inc'))
+    inc.require('train')
+    before = trainFeatures(inc)  # fills profile and similarity caches
+
+    rows = set(inc.applyDelta(paperCsv='PaperDelta.csv', paperAuthorCsv='PaperAuthorDelta.csv'))
+    after = trainFeatures(inc)
+
+    full = feature.Data(os.path.join(self.runDir, 'full'))
+    full.require('train')
+    expected = trainFeatures(full)
+
+    for aid in full.graph.authorIds.tolist():
+      self.assertEqual(sorted(inc.graph.publications(aid)), sorted(full.graph.publications(aid)))
+      counts, fullCounts = inc.graph.publishCount(aid), full.graph.publishCount(aid)
+      self.assertEqual(sorted(counts), sorted(fullCounts))
+      for cid in counts:
+        self.assertAlmostEqual(counts[cid], fullCounts[cid])
+
+    self.assertEqual(sorted(after), sorted(expected))
+    changed = set()
+    for key in expected:
+      for value, fullValue in zip(after[key], expected[key]):
+        self.assertAlmostEqual(value, fullValue)
+      if any(abs(x - y) > 1e-12 for x, y in zip(before[key], after[key])):
+        changed.add(key)
+
+    # Features changed by new and by updated papers, every one reported
+    self.assertTrue(any(pid in self.newPapers for aid, pid in changed))
+    self.assertTrue(any(pid in self.updatedPapers for aid, pid in changed))
+    self.assertEqual(changed - rows, set())
+
+
+if __name__ == '__main__':
+  unittest.main()
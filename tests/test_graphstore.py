@@ -0,0 +1,99 @@
+import os, sys, random, collections, unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from feature import euclidean_distance
+from graphstore import GraphStore
+from idmap import IdArray
+
+
+def dictCounts(links, venue):
+  """
+  Return authorId -> conferenceId/journalId -> min-max normalized # papers,
+  counted with dicts from (paperId, authorId) links
+  """
+  publications = collections.defaultdict(set)
+  for pid, aid in links:
+    publications[aid].add(pid)
+
+  counts = {}
+  for aid, pids in publications.iteritems():
+    count = collections.defaultdict(int)
+    for pid in pids:
+      if venue.get(pid, -1) >= 0:
+        count[venue[pid]] += 1
+
+    normalized = {}
+    if len(count) > 0:
+      maxCount, minCount = max(count.values()), min(count.values())
+      for cid, n in count.iteritems():
+        normalized[cid] = 1.0 if maxCount == minCount else (n - minCount) / float(maxCount - minCount)
+    counts[aid] = normalized
+  return counts
+
+
+class GraphStoreTest(unittest.TestCase):
+  def setUp(self):
+    rand = random.Random(13)
+    self.links = [(rand.randint(1, 300), rand.randint(1, 80)) for i in range(0, 1500)]
+    self.links += self.links[:100]  # duplicate links are counted once
+
+    # Papers without a venue or missing in Paper.csv count no venue
+    self.venue = dict((pid, rand.choice([-1, 3, 7, 8, 20, 41])) for pid in range(1, 280))
+    pids = sorted(self.venue)
+    paperPublish = IdArray.fromColumns(pids, [self.venue[pid] for pid in pids], -1)
+
+    pids, aids = zip(*self.links)
+    self.graph = GraphStore.fromPairs(pids, aids, paperPublish)
+    self.counts = dictCounts(self.links, self.venue)
+
+
+  def testFromPairs(self):
+    coAuthors = collections.defaultdict(set)
+    publications = collections.defaultdict(set)
+    for pid, aid in self.links:
+      coAuthors[pid].add(aid)
+      publications[aid].add(pid)
+
+    self.assertEqual(self.graph.paperIds.tolist(), sorted(coAuthors))
+    self.assertEqual(self.graph.authorIds.tolist(), sorted(publications))
+    for pid in coAuthors:
+      self.assertEqual(self.graph.coAuthors(pid), sorted(coAuthors[pid]))
+    for aid in publications:
+      self.assertEqual(self.graph.publications(aid), sorted(publications[aid]))
+
+      counts = self.graph.publishCount(aid)
+      self.assertEqual(sorted(counts), sorted(self.counts[aid]))
+      for cid in counts:
+        self.assertAlmostEqual(counts[cid], self.counts[aid][cid])
+
+    self.assertEqual(self.graph.coAuthors(10 ** 6), [])
+    self.assertEqual(self.graph.publishCount(10 ** 6), {})
+
+
+  def testVenueDistances(self):
+    aids = sorted(self.counts)
+    for aid in aids[::7]:
+      others = aids + [10 ** 6, aid]  # an unknown author and aid itself
+      expected = [euclidean_distance(self.counts[aid], self.counts.get(other, {})) for other in others]
+      np.testing.assert_allclose(self.graph.venueDistances(aid, others), expected, atol=1e-9)
+
+
+  def testVenueDistancesAfterRecount(self):
+    # Recounted authors are read from the overlay
+    pid, aid = 500, int(self.graph.authorIds[0])  # a paper with no links yet
+    self.venue[pid] = 99
+    self.links.append((pid, aid))
+    paperPublish = IdArray.fromColumns(sorted(self.venue), [self.venue[p] for p in sorted(self.venue)], -1)
+    self.graph.addLinks([pid], [aid])
+    self.graph.recount([aid], paperPublish)
+    counts = dictCounts(self.links, self.venue)
+
+    aids = sorted(counts)
+    expected = [euclidean_distance(counts[aid], counts[other]) for other in aids]
+    np.testing.assert_allclose(self.graph.venueDistances(aid, aids), expected, atol=1e-9)
+
+
+if __name__ == '__main__':
+  unittest.main()
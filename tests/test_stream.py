@@ -0,0 +1,60 @@
+import os, sys, pickle, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from stream import SpillDict
+
+
+class SpillDictTest(unittest.TestCase):
+  def setUp(self):
+    self.tmpDir = tempfile.mkdtemp()
+    self.table = SpillDict(os.path.join(self.tmpDir, 'table.db'), '')
+
+
+  def tearDown(self):
+    if self.table.disk is not None:
+      self.table.disk.close()
+    shutil.rmtree(self.tmpDir)
+
+
+  def testSpillAndReadBack(self):
+    table = self.table
+    table[1] = 'first'
+    table[2] = 'second'
+    table.spill()
+    table[3] = 'third'
+
+    self.assertEqual(len(table.memory), 1)
+    self.assertEqual(len(table), 3)
+    self.assertEqual([table[1], table[2], table[3]], ['first', 'second', 'third'])
+    self.assertEqual(table[4], '')
+    self.assertEqual(table.get(4, None), None)
+    self.assertTrue(2 in table)
+    self.assertFalse(4 in table)
+    self.assertEqual(sorted(table.iteritems()), [(1, 'first'), (2, 'second'), (3, 'third')])
+
+
+  def testSetSpilledKey(self):
+    table = self.table
+    table[1] = 'first'
+    table.spill()
+    table[1] = 'changed'
+
+    self.assertEqual(table[1], 'changed')
+    self.assertEqual(len(table), 1)
+    self.assertEqual(table.memory, {})
+
+
+  def testPickle(self):
+    table = self.table
+    table[1] = 'first'
+    table.spill()
+    table[2] = 'second'
+
+    loaded = pickle.loads(pickle.dumps(table, pickle.HIGHEST_PROTOCOL))
+    self.assertEqual(sorted(loaded.iteritems()), [(1, 'first'), (2, 'second')])
+    self.assertEqual(loaded[3], '')
+    loaded.disk.close()
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,64 @@
+import string
+
+
+class Tokenizer:
+  """
+  Lowercase, ignore non-alphabet except space and remove stopwords, same
+  result as feature.stripWords. Characters are filtered by one str.translate
+  and stopwords are looked up in a frozenset. Normalized strings and their
+  token ids are cached, so repeated names are processed once
+  """
+  lowerTable = string.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+  deleteChars = ''.join(chr(c) for c in range(0, 256) if chr(c) not in string.ascii_letters + ' ')
+
+  def __init__(self, stopwords, memoSize=2 ** 17):
+    self.stopwords = frozenset(stopwords)
+    self.memoSize = memoSize  # entries of each cache, cleared when full
+    self.memo = {}        # raw string -> normalized string
+    self.tokenCache = {}  # normalized string -> token ids
+    self.vocabulary = {}  # word -> token id
+    self.words = []       # token id -> word
+
+
+  def normalize(self, raw):
+    """
+    Return raw with non-alphabet and stopwords removed, words joined by space
+    """
+    normalized = self.memo.get(raw)
+    if normalized is None:
+      stopwords = self.stopwords
+      normalized = ' '.join([w for w in raw.translate(self.lowerTable, self.deleteChars).split() \
+                             if w not in stopwords])
+      if len(self.memo) >= self.memoSize:
+        self.memo.clear()
+      self.memo[raw] = normalized
+    return normalized
+
+
+  def normalizeMany(self, column):
+    """
+    Return normalize() of each string of column, None kept as None
+    """
+    normalize = self.normalize
+    return [None if raw is None else normalize(raw) for raw in column]
+
+
+  def tokenIds(self, normalized):
+    """
+    Return tuple of token ids of a normalized string, new words get the next id
+    """
+    ids = self.tokenCache.get(normalized)
+    if ids is None:
+      vocabulary, words = self.vocabulary, self.words
+      ids = []
+      for word in normalized.split():
+        i = vocabulary.get(word)
+        if i is None:
+          i = vocabulary[word] = len(words)
+          words.append(word)
+        ids.append(i)
+      ids = tuple(ids)
+      if len(self.tokenCache) >= self.memoSize:
+        self.tokenCache.clear()
+      self.tokenCache[normalized] = ids
+    return ids